@@ -1,6 +1,12 @@
 from easy_prompting.message import Role, Message
-from easy_prompting.lm import LMError, LM
+from easy_prompting.history import History
+from easy_prompting.lm import LMError, RetryError, PendingError, LM, AsyncLM, ExecutorLM
 from easy_prompting.logger import Logger
-from easy_prompting.instruction import ExtractionError, Instruction
+from easy_prompting.context import Tokenizer, ContextPolicy
+from easy_prompting.instruction import ExtractionError, Parser, TextParser, Instruction
 from easy_prompting.debugger import Debugger
+from easy_prompting.observer import Span, Report, Observer
+from easy_prompting.cache import CachePolicy, Cache, DirCache, copy_cache
+from easy_prompting.batch import Batch, ingest_batch
+from easy_prompting.snapshot import Snapshot
 from easy_prompting.prompter import Prompter
\ No newline at end of file
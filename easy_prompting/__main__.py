@@ -1,7 +1,10 @@
+import re
+import sys
+import time
 import argparse
 from pathlib import Path
 
-from easy_prompting.prebuilt import GPT, Prompter, PrintLogger, PrintDebugger, list_text, ListItem, ChoiceItem, pad_text, delimit_code, DataInstr, CodeInstr, ContextInstr, ListInstr, ChoiceInstr
+from easy_prompting.prebuilt import LMError, GPT, Prompter, DirCache, import_cache, export_cache, get_cache_stats, open_cache, ingest_batch, load_instruction, run_dataset, PrintLogger, PrintDebugger, list_text, ListItem, ChoiceItem, pad_text, delimit_code, DataInstr, CodeInstr, ContextInstr, ListInstr, ChoiceInstr
 
 def chat_bot(model_name: str) -> None:
     """Chat with an LM"""
@@ -10,7 +13,7 @@ def chat_bot(model_name: str) -> None:
     prompter.set_logger(PrintLogger()) # print conversation
     prompter.set_debugger(PrintDebugger()) # get user input
     prompter.set_tag("chat bot") # set conversation tag
-    prompter.set_cache(Path(f"completions/{model_name}"))
+    prompter.set_cache(Path("completions"))
     prompter.add_message(
         "You are a ChatBot. Talk with the user.",
         role="developer"
@@ -26,7 +29,7 @@ def programmer(model_name: str, task: str) -> None:
     prompter = Prompter(lm)
     prompter.set_logger(PrintLogger())
     prompter.set_debugger(PrintDebugger())
-    prompter.set_cache(Path(f"completions/{model_name}"))
+    prompter.set_cache(Path("completions"))
     prompter.set_tag("programmer")
     prompter.add_message(
         list_text(
@@ -75,10 +78,39 @@ def programmer(model_name: str, task: str) -> None:
             print(f"The agent suggest the following python code to solve the task:")
             print(pad_text(code, "  "))
 
+def parse_number(text: str, units: dict[str, float]) -> float:
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([a-zA-Z]*)\s*", text)
+    if match is None or match[2].lower() not in units:
+        raise argparse.ArgumentTypeError(f"Invalid value: \"{text}\" (expected a number with one of the units {', '.join(unit for unit in units if unit)})")
+    return float(match[1]) * units[match[2].lower()]
+
+def parse_age(text: str) -> float:
+    return parse_number(text, {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800})
+
+def parse_size(text: str) -> int:
+    return int(parse_number(text, {"": 1, "b": 1, "k": 1e3, "kb": 1e3, "m": 1e6, "mb": 1e6, "g": 1e9, "gb": 1e9}))
+
+def print_cache_stats(path: str) -> None:
+    with open_cache(path) as cache:
+        stats = get_cache_stats(cache)
+    print(f"Cache \"{path}\":")
+    for namespace, namespace_stats in stats.items():
+        print(f"  {'(no namespace)' if namespace is None else namespace}:")
+        print(f"    entries: {namespace_stats['entries']}")
+        print(f"    bytes: {namespace_stats['bytes']}")
+        print(f"    oldest: {time.ctime(namespace_stats['oldest'])}")
+        print(f"    newest: {time.ctime(namespace_stats['newest'])}")
+        print(f"    ages: " + ", ".join(f"{age}: {count}" for age, count in namespace_stats["ages"].items()))
+    if len(stats) == 0:
+        print("  (empty)")
+
+def print_progress(stats: dict) -> None:
+    print(f"\r{stats['completed']} completed, {stats['failed']} failed, {stats['skipped']} skipped ({stats['records_per_second']:.1f} records/s)", end="", file=sys.stderr, flush=True)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(
         prog="easy_prompting",
-        description="Run one of the EasyPrompting demos."
+        description="Run one of the EasyPrompting demos, run a prompt over a dataset, maintain a completion cache or process deferred completions."
     )
     parser.add_argument(
         "--demo",
@@ -92,22 +124,108 @@ if __name__ == "__main__":
         help="The OpenAI model to use (default='gpt-4o-mini')",
         default="gpt-4o-mini"
     )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    cache_parser = commands.add_parser("cache", help="Maintain a completion cache")
+    cache_commands = cache_parser.add_subparsers(dest="cache_command", metavar="COMMAND", required=True)
+    import_parser = cache_commands.add_parser("import", help="Copy all completions of one cache or archive into another cache")
+    import_parser.add_argument("src", metavar="SRC", help="The cache or archive to copy from (a directory, an SQLite file or a '.tar.gz' archive)")
+    import_parser.add_argument("dst", metavar="DST", help="The cache to copy into (a directory or an SQLite file, e.g. 'completions.sqlite')")
+    export_parser = cache_commands.add_parser("export", help="Copy all completions of a cache into an archive")
+    export_parser.add_argument("cache", metavar="CACHE", help="The cache to copy from (a directory or an SQLite file)")
+    export_parser.add_argument("archive", metavar="ARCHIVE", help="The archive to create (e.g. 'completions.tar.gz')")
+    stats_parser = cache_commands.add_parser("stats", help="Show the number, size and age of the completions in a cache")
+    stats_parser.add_argument("cache", metavar="CACHE", help="The cache to inspect (a directory or an SQLite file)")
+    prune_parser = cache_commands.add_parser("prune", help="Remove the oldest completions of a cache")
+    prune_parser.add_argument("cache", metavar="CACHE", help="The cache to prune (a directory or an SQLite file)")
+    prune_parser.add_argument("--namespace", metavar="NAME", help="Only prune this namespace, e.g. a model name (default: all namespaces)")
+    prune_parser.add_argument("--max-age", metavar="AGE", type=parse_age, help="Remove completions older than this (e.g. '30d', '12h')")
+    prune_parser.add_argument("--max-entries", metavar="N", type=int, help="Keep at most this many completions per namespace")
+    prune_parser.add_argument("--max-bytes", metavar="SIZE", type=parse_size, help="Keep at most this many bytes per namespace (e.g. '500MB')")
+    compact_parser = cache_commands.add_parser("compact", help="Remove stale lock and temporary files and reclaim unused space")
+    compact_parser.add_argument("cache", metavar="CACHE", help="The cache to compact (a directory or an SQLite file)")
+    compress_parser = cache_commands.add_parser("compress", help="Rewrite the completions of a cache directory with another compression")
+    compress_parser.add_argument("cache", metavar="CACHE", help="The cache directory to compress")
+    compress_parser.add_argument("--method", choices=["zlib", "zstd", "none"], help="The compression to use (default='zlib')", default="zlib")
+    batch_parser = commands.add_parser("batch", help="Process deferred completions")
+    batch_commands = batch_parser.add_subparsers(dest="batch_command", metavar="COMMAND", required=True)
+    ingest_parser = batch_commands.add_parser("ingest", help="Save the completions of a batch results file into a cache")
+    ingest_parser.add_argument("results", metavar="RESULTS", help="The JSONL file with the results of a batch")
+    ingest_parser.add_argument("cache", metavar="CACHE", help="The cache to save the completions into (a directory or an SQLite file)")
+    run_parser = commands.add_parser("run", help="Run a prompt template over every record of a JSONL dataset")
+    run_parser.add_argument("input", metavar="INPUT", help="The JSONL file with one record (a JSON object) per line")
+    run_parser.add_argument("output", metavar="OUTPUT", help="The JSONL file to append the results to (records that already have a result in it are skipped)")
+    run_parser.add_argument("--instruction", metavar="MODULE:ATTR", required=True, help="The instruction to apply, e.g. 'my_module:instruction' (or a function that returns it)")
+    template_group = run_parser.add_mutually_exclusive_group(required=True)
+    template_group.add_argument("--template", metavar="TEXT", help="The message to send for every record, with '{FIELD}' for the fields of the record")
+    template_group.add_argument("--template-file", metavar="FILE", help="A file that contains the template")
+    run_parser.add_argument("--system", metavar="TEXT", help="A developer message to send before every record")
+    run_parser.add_argument("--id-field", metavar="NAME", help="The field that identifies a record (default='id', or the line number if it is missing)", default="id")
+    run_parser.add_argument("--cache", metavar="CACHE", help="The cache to use (default='completions')", default="completions")
+    run_parser.add_argument("--workers", metavar="N", type=int, help="How many records to process in parallel (default=8)", default=8)
     args = parser.parse_args()
-    match args.demo:
-        case "chat bot":
+    match args.command, args.demo:
+        case "cache", _:
+            match args.cache_command:
+                case "import":
+                    count = import_cache(args.src, args.dst)
+                    print(f"Imported {count} completion(s) from \"{args.src}\" into \"{args.dst}\"")
+                case "export":
+                    with open_cache(args.cache) as cache:
+                        count = export_cache(cache, args.archive)
+                    print(f"Exported {count} completion(s) from \"{args.cache}\" into \"{args.archive}\"")
+                case "stats":
+                    print_cache_stats(args.cache)
+                case "prune":
+                    with open_cache(args.cache) as cache:
+                        namespaces = list(cache.get_namespaces()) if args.namespace is None else [args.namespace]
+                        count = sum(cache.prune(namespace, args.max_age, args.max_entries, args.max_bytes) for namespace in namespaces)
+                    print(f"Removed {count} completion(s) from \"{args.cache}\"")
+                case "compact":
+                    with open_cache(args.cache) as cache:
+                        count = cache.compact()
+                    print(f"Compacted \"{args.cache}\" ({count} stale file(s) or lease(s) removed)")
+                case "compress":
+                    with open_cache(args.cache) as cache:
+                        if not isinstance(cache, DirCache):
+                            parser.error("Only cache directories can be compressed")
+                        try:
+                            count = cache.compress(None if args.method == "none" else args.method)
+                        except LMError as e:
+                            parser.error(str(e))
+                    print(f"Rewrote {count} completion(s) of \"{args.cache}\" with compression \"{args.method}\"")
+        case "batch", _:
+            match args.batch_command:
+                case "ingest":
+                    with open_cache(args.cache) as cache:
+                        ingested, failed = ingest_batch(args.results, cache)
+                    print(f"Ingested {ingested} completion(s) from \"{args.results}\" into \"{args.cache}\" ({failed} failed)")
+        case "run", _:
+            try:
+                instruction = load_instruction(args.instruction)
+            except (ImportError, AttributeError, ValueError) as e:
+                parser.error(str(e))
+            template = args.template if args.template_file is None else Path(args.template_file).read_text(encoding="utf-8")
+            prompter = Prompter(GPT(args.model_name))
+            with open_cache(args.cache) as cache:
+                prompter.set_cache(cache)
+                if args.system is not None:
+                    prompter.add_message(args.system, role="developer")
+                stats = run_dataset(prompter, instruction, template, args.input, args.output, args.id_field, max_workers=args.workers, progress=print_progress)
+            print(f"\rProcessed \"{args.input}\" into \"{args.output}\": {stats['completed']} completed, {stats['failed']} failed, {stats['skipped']} skipped ({stats['elapsed']:.1f}s)", file=sys.stderr)
+        case _, "chat bot":
             chat_bot(args.model_name)
-        case "square root":
+        case _, "square root":
             # Possible task
             programmer(
                 args.model_name,
                 f"I need a function that calculates the square root of a whole number, if that square root is a natural number."
                 f"\nIf it is not a natural number, the function can just return None."
             )
-        case "halting problem":
+        case _, "halting problem":
             # Impossible task
             programmer(
                 args.model_name,
                 f"I need a function that determines if the code of a python function would return in finite time when executed."
             )
-        case name:
+        case _, name:
             print(f"Unknown demo: \"{name}\"")
\ No newline at end of file
@@ -0,0 +1,85 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from easy_prompting.cache import Cache
+from easy_prompting.utils import create_dir
+
+def to_custom_id(key: str, namespace: Optional[str] = None) -> str:
+    return key if namespace is None else f"{namespace}/{key}"
+
+def from_custom_id(custom_id: str) -> tuple[str, Optional[str]]:
+    if "/" not in custom_id:
+        return custom_id, None
+    namespace, key = custom_id.rsplit("/", 1)
+    return key, namespace
+
+class Batch:
+    def __init__(self, file_path: str | Path, url: str = "/v1/chat/completions"):
+        self._mutex = threading.Lock()
+        self.set_file_path(file_path)
+        self.set_url(url)
+
+    def set_file_path(self, file_path: str | Path) -> None:
+        self._file_path = Path(file_path)
+        self._custom_ids: set[str] = set()
+        if self._file_path.is_file():
+            with self._file_path.open(encoding="utf-8") as file:
+                for line in file:
+                    if line.strip() != "":
+                        self._custom_ids.add(json.loads(line)["custom_id"])
+
+    def get_file_path(self) -> Path:
+        return self._file_path
+
+    def set_url(self, url: str = "/v1/chat/completions") -> None:
+        self._url = url
+
+    def get_url(self) -> str:
+        return self._url
+
+    def get_size(self) -> int:
+        return len(self._custom_ids)
+
+    def add(self, key: str, request: dict[str, Any], namespace: Optional[str] = None) -> bool:
+        custom_id = to_custom_id(key, namespace)
+        line = json.dumps(dict(custom_id=custom_id, method="POST", url=self._url, body=request), ensure_ascii=False) + "\n"
+        with self._mutex:
+            if custom_id in self._custom_ids:
+                return False
+            create_dir(self._file_path.parent)
+            with self._file_path.open("a", encoding="utf-8") as file:
+                file.write(line)
+            self._custom_ids.add(custom_id)
+        return True
+
+def _get_completion(result: dict[str, Any]) -> Optional[str]:
+    if "completion" in result:
+        return result["completion"]
+    if result.get("error") is not None:
+        return None
+    response = result.get("response") or {}
+    if response.get("status_code", 200) != 200:
+        return None
+    try:
+        return response["body"]["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+def ingest_batch(file_path: str | Path, cache: Cache) -> tuple[int, int]:
+    ingested = failed = 0
+    with Path(file_path).open(encoding="utf-8") as file:
+        for line in file:
+            if line.strip() == "":
+                continue
+            result = json.loads(line)
+            completion = _get_completion(result)
+            if completion is None:
+                failed += 1
+                continue
+            key, namespace = from_custom_id(result["custom_id"])
+            cache.save(key, completion, namespace)
+            ingested += 1
+    cache.flush()
+    return ingested, failed
\ No newline at end of file
@@ -0,0 +1,299 @@
+import io
+import sys
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+from importlib import metadata
+from pathlib import Path
+from typing import Any, Callable, Iterable, Optional
+
+from easy_prompting.prebuilt import (
+    Message, History, Prompter, Logger, Instruction, DirCache, SQLiteCache, FakeLM, GPT,
+    PrintLogger, FuncLogger, FileLogger, JSONLogger, BackgroundLogger, MultiLogger, ReadableLogger,
+    DataInstr, ListInstr, ListItem, ChoiceInstr, ChoiceItem
+)
+from easy_prompting.utils import load_text, save_text, hash_str
+
+Result = dict[str, Any]
+
+def _measure(name: str, params: dict[str, Any], run: Callable[[Any], Any], setup: Callable[[], Any] = lambda: None, number: int = 1, repeat: int = 5) -> Result:
+    times: list[float] = []
+    for _ in range(repeat):
+        state = setup()
+        start = time.perf_counter()
+        run(state)
+        times.append(time.perf_counter() - start)
+    best = min(times)
+    return dict(
+        name=name,
+        params=params,
+        number=number,
+        best=best,
+        median=statistics.median(times),
+        per_op=best / number,
+        ops_per_second=number / best if best > 0 else None
+    )
+
+def _make_messages(length: int, salt: str = "") -> list[Message]:
+    return [Message(f"{salt}message {i} " + "lorem ipsum " * 20, "user" if i % 2 == 0 else "assistant") for i in range(length)]
+
+def _make_tree(depth: int, width: int, choice: bool = False) -> tuple[Instruction, str]:
+    if depth == 0:
+        return DataInstr("Write a short sentence"), "A short sentence."
+    children = [_make_tree(depth-1, width, not choice) for _ in range(width)]
+    keys = [f"key{depth}_{i}:" for i in range(width)]
+    if choice:
+        instruction = ChoiceInstr(*(ChoiceItem(f"If option {i} applies", key, child) for i, (key, (child, _)) in enumerate(zip(keys, children))))
+        return instruction, f"{keys[0]} {children[0][1]}"
+    instruction = ListInstr(*(ListItem(key, child) for key, (child, _) in zip(keys, children)))
+    return instruction, "\n".join(f"{key} {response}" for key, (_, response) in zip(keys, children))
+
+def bench_keys(lengths: Iterable[int], number: int, repeat: int) -> list[Result]:
+    results: list[Result] = []
+    for length in lengths:
+        counter = iter(range(sys.maxsize))
+        results.append(_measure(
+            "key/full", dict(length=length),
+            lambda conversations: [History.from_messages(messages).get_key("fingerprint") for messages in conversations],
+            lambda: [_make_messages(length, f"{next(counter)} ") for _ in range(number)],
+            number, repeat
+        ))
+        results.append(_measure(
+            "key/legacy", dict(length=length),
+            lambda conversations: [hash_str("\n\n".join(repr(message) for message in messages)) for messages in conversations],
+            lambda: [_make_messages(length, f"{next(counter)} ") for _ in range(number)],
+            number, repeat
+        ))
+        history = History.from_messages(_make_messages(length))
+        results.append(_measure(
+            "key/incremental", dict(length=length),
+            lambda messages: [history.add(message).get_key("fingerprint") for message in messages],
+            lambda: [Message(f"{next(counter)} next message", "user") for _ in range(number)],
+            number, repeat
+        ))
+    return results
+
+def bench_disk(size: int, number: int, repeat: int) -> list[Result]:
+    results: list[Result] = []
+    text = "x" * size
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = Path(dir_name)
+        keys = [hash_str(str(i)) for i in range(number)]
+        results.append(_measure("text/save", dict(size=size), lambda _: [save_text(path / "text" / key, text) for key in keys], number=number, repeat=repeat))
+        results.append(_measure("text/load_hit", dict(size=size), lambda _: [load_text(path / "text" / key) for key in keys], number=number, repeat=repeat))
+        results.append(_measure("text/load_miss", dict(size=size), lambda _: [load_text(path / "missing" / key) for key in keys], number=number, repeat=repeat))
+        for name, cache in (("dir", DirCache(path / "dir")), ("sqlite", SQLiteCache(path / "cache.sqlite"))):
+            with cache:
+                results.append(_measure(f"cache/{name}/save", dict(size=size), lambda _: [cache.save(key, text) for key in keys], number=number, repeat=repeat))
+                results.append(_measure(f"cache/{name}/load_hit", dict(size=size), lambda _: [cache.load(key) for key in keys], number=number, repeat=repeat))
+                results.append(_measure(f"cache/{name}/load_miss", dict(size=size), lambda _: [cache.load(key, "missing") for key in keys], number=number, repeat=repeat))
+    return results
+
+def bench_instructions(depths: Iterable[int], width: int, repeat: int) -> list[Result]:
+    results: list[Result] = []
+    for depth in depths:
+        params = dict(depth=depth, width=width)
+        results.append(_measure("instruction/describe", params, lambda instruction: instruction.get_description(), lambda: _make_tree(depth, width)[0], repeat=repeat))
+        instruction, response = _make_tree(depth, width)
+        instruction.compile()
+        results.append(_measure("instruction/describe_memoized", params, lambda _: instruction.get_description(), repeat=repeat))
+        results.append(_measure("instruction/extract", params | dict(size=len(response)), lambda _: instruction.extract(response), repeat=repeat))
+        chunks = [response[i:i+16] for i in range(0, len(response), 16)]
+
+        def parse(_: Any) -> Any:
+            parser = instruction.get_parser()
+            for chunk in chunks:
+                parser.feed(chunk)
+            return parser.close()
+
+        results.append(_measure("instruction/parse_stream", params | dict(size=len(response), chunk_size=16), parse, repeat=repeat))
+    return results
+
+def bench_loggers(number: int, repeat: int) -> list[Result]:
+    results: list[Result] = []
+    messages = _make_messages(number)
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = Path(dir_name)
+        loggers: dict[str, Callable[[], Logger]] = {
+            "print": lambda: PrintLogger(),
+            "func": lambda: FuncLogger(lambda text: None),
+            "file": lambda: FileLogger(path / "file.log"),
+            "json": lambda: JSONLogger(path / "file.jsonl"),
+            "background": lambda: BackgroundLogger(FileLogger(path / "background.log")),
+            "readable": lambda: ReadableLogger(FuncLogger(lambda text: None)),
+            "multi": lambda: MultiLogger(FuncLogger(lambda text: None), FuncLogger(lambda text: None))
+        }
+        for name, make_logger in loggers.items():
+            def log(logger: Logger) -> None:
+                with redirect_stdout(io.StringIO()):
+                    for i, message in enumerate(messages):
+                        logger.log(message, i, "benchmark")
+            results.append(_measure(f"logger/{name}", {}, log, make_logger, number, repeat))
+
+            def log_and_close(logger: Logger) -> None:
+                log(logger)
+                logger.close()
+            results.append(_measure(f"logger/{name}/close", {}, log_and_close, make_logger, number, repeat))
+    return results
+
+def bench_end_to_end(turns: int, inputs: int, depth: int, repeat: int) -> list[Result]:
+    results: list[Result] = []
+    instruction, response = _make_tree(depth, 3)
+    instruction.compile()
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = Path(dir_name)
+        counter = iter(range(sys.maxsize))
+
+        def new_prompter(cache: Optional[Path] = None) -> Prompter:
+            prompter = Prompter(FakeLM(lambda messages: response))
+            prompter.set_cache(cache)
+            return prompter
+
+        def converse(prompter: Prompter) -> None:
+            for i in range(turns):
+                prompter.add_message(f"Turn {i}")
+                prompter.add_completion()
+
+        results.append(_measure("e2e/no_cache", dict(turns=turns), converse, new_prompter, turns, repeat))
+        results.append(_measure("e2e/cold", dict(turns=turns), converse, lambda: new_prompter(path / f"cold{next(counter)}"), turns, repeat))
+        converse(new_prompter(path / "warm"))
+        results.append(_measure("e2e/warm", dict(turns=turns), converse, lambda: new_prompter(path / "warm"), turns, repeat))
+
+        def get_data(prompter: Prompter) -> None:
+            for i in range(turns):
+                prompter.add_message(f"Turn {i}")
+                prompter.get_data(instruction)
+
+        results.append(_measure("e2e/get_data", dict(turns=turns, depth=depth), get_data, new_prompter, turns, repeat))
+        results.append(_measure("e2e/get_data_stream", dict(turns=turns, depth=depth), lambda prompter: [prompter.get_data(instruction, stream=True) for _ in range(turns)], new_prompter, turns, repeat))
+        results.append(_measure("e2e/map", dict(inputs=inputs, depth=depth), lambda prompter: prompter.map([f"Input {i}" for i in range(inputs)], instruction), lambda: new_prompter(path / f"map{next(counter)}"), inputs, repeat))
+
+        async def complete_all(prompters: list[Prompter]) -> None:
+            await asyncio.gather(*(prompter.add_completion_async() for prompter in prompters))
+
+        def make_prompters() -> list[Prompter]:
+            prompters = [new_prompter(path / f"async{next(counter)}") for _ in range(inputs)]
+            for i, prompter in enumerate(prompters):
+                prompter.add_message(f"Input {i}")
+            return prompters
+
+        results.append(_measure("e2e/async", dict(inputs=inputs), lambda prompters: asyncio.run(complete_all(prompters)), make_prompters, inputs, repeat))
+    return results
+
+def bench_contention(processes: int, conversations: int, keys: int, repeat: int) -> list[Result]:
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = Path(dir_name)
+        counter = iter(range(sys.maxsize))
+        calls: list[int] = []
+        code = (
+            f"import sys, asyncio"
+            f"\nfrom easy_prompting.prebuilt import FakeLM, Prompter"
+            f"\nlm = FakeLM(lambda messages: 'Answer')"
+            f"\nlm.set_latency(0.05)"
+            f"\nasync def complete(i):"
+            f"\n    prompter = Prompter(lm)"
+            f"\n    prompter.set_cache(sys.argv[1])"
+            f"\n    prompter.add_message(f'Input {{i % {keys}}}')"
+            f"\n    await prompter.add_completion_async()"
+            f"\nasync def main():"
+            f"\n    await asyncio.gather(*(complete(i) for i in range({conversations})))"
+            f"\nasyncio.run(main())"
+            f"\nprint(lm.get_calls())"
+        )
+
+        def run(cache: Path) -> None:
+            workers = [subprocess.Popen([sys.executable, "-c", code, str(cache)], stdout=subprocess.PIPE, text=True) for _ in range(processes)]
+            calls.append(sum(int(worker.communicate()[0]) for worker in workers))
+
+        result = _measure("contention/processes", dict(processes=processes, conversations=conversations, keys=keys), run, lambda: path / f"cache{next(counter)}", processes * conversations, repeat)
+        return [result | dict(lm_calls=max(calls), duplicate_calls=max(calls) - keys)]
+
+def bench_startup(repeat: int) -> list[Result]:
+    results: list[Result] = []
+    with tempfile.TemporaryDirectory() as dir_name:
+        path = Path(dir_name)
+        prompter = Prompter(GPT("gpt-4o-mini"))
+        cache = DirCache(path)
+        for i in range(3):
+            prompter.add_message(f"Turn {i}")
+            cache.save(prompter.get_key(), f"Answer {i}", prompter.get_lm().get_namespace())
+            prompter.add_message(f"Answer {i}", "assistant")
+        codes = {
+            "startup/python": "",
+            "startup/import": "import easy_prompting",
+            "startup/import_prebuilt": "import easy_prompting.prebuilt",
+            "startup/cached_run": (
+                f"from pathlib import Path"
+                f"\nfrom easy_prompting.prebuilt import GPT, Prompter"
+                f"\nprompter = Prompter(GPT('gpt-4o-mini'))"
+                f"\nprompter.set_cache(Path({str(path)!r}))"
+                f"\nfor i in range(3):"
+                f"\n    prompter.add_message(f'Turn {{i}}')"
+                f"\n    prompter.add_completion()"
+            )
+        }
+        for name, code in codes.items():
+            code += "\nimport sys, json\nprint(json.dumps(sorted(name for name in ('openai', 'httpx', 'ssl', 'asyncio') if name in sys.modules)))"
+            outputs: list[str] = []
+            result = _measure(name, {}, lambda _: outputs.append(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout), repeat=repeat)
+            results.append(result | dict(network_modules=json.loads(outputs[-1])))
+    return results
+
+def run_benchmarks(repeat: int = 5, quick: bool = False) -> dict[str, Any]:
+    number = 100 if quick else 1000
+    results: list[Result] = []
+    results += bench_keys((10, 100) if quick else (10, 100, 1000), 10 if quick else 100, repeat)
+    results += bench_disk(1024, number, repeat)
+    results += bench_instructions((2, 4) if quick else (2, 4, 6), 3, repeat)
+    results += bench_loggers(number, repeat)
+    results += bench_end_to_end(10 if quick else 50, 16 if quick else 64, 3, repeat)
+    results += bench_contention(4, 50 if quick else 200, 10 if quick else 40, repeat)
+    results += bench_startup(repeat)
+    try:
+        version = metadata.version("easy_prompting")
+    except metadata.PackageNotFoundError:
+        version = None
+    return dict(
+        version=version,
+        python=platform.python_version(),
+        platform=platform.platform(),
+        time=time.time(),
+        repeat=repeat,
+        results=results
+    )
+
+def compare_benchmarks(old: dict[str, Any], new: dict[str, Any]) -> list[tuple[str, float, float]]:
+    def key(result: Result) -> str:
+        return f"{result['name']} {json.dumps(result['params'], sort_keys=True)}"
+    old_results = {key(result): result for result in old["results"]}
+    return [
+        (key(result), old_results[key(result)]["per_op"], result["per_op"])
+        for result in new["results"]
+        if key(result) in old_results
+    ]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        prog="easy_prompting.benchmark",
+        description="Benchmark EasyPrompting and print the results as JSON."
+    )
+    parser.add_argument("--repeat", metavar="N", type=int, help="How often each benchmark is repeated (default=5)", default=5)
+    parser.add_argument("--quick", action="store_true", help="Run smaller benchmarks")
+    parser.add_argument("--output", metavar="FILE", help="Write the results into a file instead of printing them")
+    parser.add_argument("--compare", metavar="FILE", help="Compare the results with the results of an earlier run")
+    args = parser.parse_args()
+    benchmarks = run_benchmarks(args.repeat, args.quick)
+    if args.output is None:
+        print(json.dumps(benchmarks, indent=2))
+    else:
+        Path(args.output).write_text(json.dumps(benchmarks, indent=2), encoding="utf-8")
+    if args.compare is not None:
+        old = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        for name, old_time, new_time in compare_benchmarks(old, benchmarks):
+            print(f"{name}: {old_time * 1e6:.1f}us -> {new_time * 1e6:.1f}us ({new_time / old_time:.2f}x)", file=sys.stderr)
\ No newline at end of file
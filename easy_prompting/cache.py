@@ -0,0 +1,251 @@
+import os
+import time
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional, Self, override
+
+from easy_prompting.utils import Compression, load_text, save_text, lock_file
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: Optional[float] = None
+    max_entries: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+class Cache(ABC):
+    def __init__(self):
+        self._locks_lock = threading.Lock()
+        self._locks: dict[tuple[Optional[str], str], tuple[threading.Lock, int]] = {}
+        self._policies: dict[Optional[str], CachePolicy] = {}
+        self._saves: dict[Optional[str], int] = {}
+        self._prune_interval = 100
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    @abstractmethod
+    def load(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        pass
+
+    def peek(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        return self.load(key, namespace)
+
+    @abstractmethod
+    def save(self, key: str, text: Optional[str], namespace: Optional[str] = None) -> None:
+        pass
+
+    @abstractmethod
+    def get_namespaces(self) -> Iterator[Optional[str]]:
+        pass
+
+    @abstractmethod
+    def get_entries(self, namespace: Optional[str] = None) -> Iterator[tuple[str, int, float]]:
+        pass
+
+    def get_keys(self, namespace: Optional[str] = None) -> Iterator[str]:
+        for key, _, _ in self.get_entries(namespace):
+            yield key
+
+    def set_policy(self, namespace: Optional[str] = None, ttl: Optional[float] = None, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        self._policies[namespace] = CachePolicy(ttl, max_entries, max_bytes)
+
+    def get_policy(self, namespace: Optional[str] = None) -> CachePolicy:
+        return self._policies.get(namespace, CachePolicy())
+
+    def set_prune_interval(self, prune_interval: int = 100) -> None:
+        self._prune_interval = prune_interval
+
+    def get_prune_interval(self) -> int:
+        return self._prune_interval
+
+    def _is_expired(self, namespace: Optional[str], saved: float) -> bool:
+        ttl = self.get_policy(namespace).ttl
+        return ttl is not None and time.time() - saved > ttl
+
+    def _count_save(self, namespace: Optional[str]) -> None:
+        policy = self.get_policy(namespace)
+        if policy.max_entries is None and policy.max_bytes is None:
+            return
+        with self._locks_lock:
+            saves = self._saves[namespace] = self._saves.get(namespace, 0) + 1
+            if saves < self._prune_interval:
+                return
+            self._saves[namespace] = 0
+        self.prune(namespace)
+
+    def prune(self, namespace: Optional[str] = None, ttl: Optional[float] = None, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> int:
+        policy = self.get_policy(namespace)
+        ttl = policy.ttl if ttl is None else ttl
+        max_entries = policy.max_entries if max_entries is None else max_entries
+        max_bytes = policy.max_bytes if max_bytes is None else max_bytes
+        self.flush()
+        entries = sorted(self.get_entries(namespace), key=lambda entry: entry[2], reverse=True)
+        keep = len(entries)
+        if ttl is not None:
+            now = time.time()
+            keep = sum(1 for _, _, saved in entries if now - saved <= ttl)
+        if max_entries is not None:
+            keep = min(keep, max_entries)
+        if max_bytes is not None:
+            total = 0
+            for i, (_, size, _) in enumerate(entries[:keep]):
+                total += size
+                if total > max_bytes:
+                    keep = i
+                    break
+        for key, _, _ in entries[keep:]:
+            self.save(key, None, namespace)
+        self.flush()
+        return len(entries) - keep
+
+    @contextmanager
+    def lock(self, key: str, namespace: Optional[str] = None) -> Iterator[None]:
+        with self._locks_lock:
+            lock, count = self._locks.get((namespace, key), (None, 0))
+            if lock is None:
+                lock = threading.Lock()
+            self._locks[namespace, key] = (lock, count + 1)
+        try:
+            with lock, self._lock(key, namespace):
+                yield
+        finally:
+            with self._locks_lock:
+                lock, count = self._locks.pop((namespace, key))
+                if count > 1:
+                    self._locks[namespace, key] = (lock, count - 1)
+
+    def _lock(self, key: str, namespace: Optional[str] = None) -> ContextManager[Any]:
+        return nullcontext()
+
+    def flush(self) -> None:
+        pass
+
+    def compact(self) -> int:
+        self.flush()
+        return 0
+
+    def close(self) -> None:
+        self.flush()
+
+class DirCache(Cache):
+    @override
+    def __init__(self, path: str | Path, lease: float = 600, compression: Optional[Compression] = None):
+        super().__init__()
+        self.set_path(path)
+        self.set_lease(lease)
+        self.set_compression(compression)
+
+    def set_path(self, path: str | Path) -> None:
+        self._path = Path(path)
+
+    def get_path(self) -> Path:
+        return self._path
+
+    def set_lease(self, lease: float = 600) -> None:
+        self._lease = lease
+
+    def get_lease(self) -> float:
+        return self._lease
+
+    def set_compression(self, compression: Optional[Compression] = None) -> None:
+        self._compression = compression
+
+    def get_compression(self) -> Optional[Compression]:
+        return self._compression
+
+    def _get_dir(self, namespace: Optional[str] = None) -> Path:
+        return self._path if namespace is None else self._path / namespace
+
+    @override
+    def load(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        file_path = self._get_dir(namespace) / key
+        if self.get_policy(namespace).ttl is not None:
+            try:
+                if self._is_expired(namespace, file_path.stat().st_mtime):
+                    return None
+            except FileNotFoundError:
+                return None
+        return load_text(file_path)
+
+    @override
+    def save(self, key: str, text: Optional[str], namespace: Optional[str] = None) -> None:
+        save_text(self._get_dir(namespace) / key, text, self._compression)
+        if text is not None:
+            self._count_save(namespace)
+
+    @override
+    def get_namespaces(self) -> Iterator[Optional[str]]:
+        yield None
+        if self._path.is_dir():
+            for dir_path in self._path.iterdir():
+                if dir_path.is_dir() and not dir_path.name.startswith("."):
+                    yield dir_path.name
+
+    @override
+    def get_entries(self, namespace: Optional[str] = None) -> Iterator[tuple[str, int, float]]:
+        dir_path = self._get_dir(namespace)
+        if dir_path.is_dir():
+            for file_path in dir_path.iterdir():
+                if not file_path.name.startswith("."):
+                    try:
+                        if file_path.is_file():
+                            stat = file_path.stat()
+                            yield file_path.name, stat.st_size, stat.st_mtime
+                    except FileNotFoundError:
+                        pass
+
+    @override
+    def _lock(self, key: str, namespace: Optional[str] = None) -> ContextManager[Any]:
+        return lock_file(self._get_dir(namespace) / f".{key}.lock", self._lease)
+
+    @override
+    def compact(self) -> int:
+        count = 0
+        for namespace in list(self.get_namespaces()):
+            dir_path = self._get_dir(namespace)
+            if not dir_path.is_dir():
+                continue
+            for file_path in dir_path.iterdir():
+                if file_path.name.startswith(".") and file_path.name.endswith((".lock", ".tmp")):
+                    try:
+                        if time.time() - file_path.stat().st_mtime > self._lease:
+                            file_path.unlink()
+                            count += 1
+                    except FileNotFoundError:
+                        pass
+            if namespace is not None:
+                try:
+                    dir_path.rmdir()
+                except OSError:
+                    pass
+        return count
+
+    def compress(self, compression: Optional[Compression] = None) -> int:
+        self.set_compression(compression)
+        count = 0
+        for namespace in list(self.get_namespaces()):
+            for key, _, saved in list(self.get_entries(namespace)):
+                file_path = self._get_dir(namespace) / key
+                text = load_text(file_path)
+                if text is not None:
+                    save_text(file_path, text, compression)
+                    os.utime(file_path, (saved, saved))
+                    count += 1
+        return count
+
+def copy_cache(src: Cache, dst: Cache) -> int:
+    count = 0
+    for namespace in src.get_namespaces():
+        for key in src.get_keys(namespace):
+            text = src.load(key, namespace)
+            if text is not None:
+                dst.save(key, text, namespace)
+                count += 1
+    dst.flush()
+    return count
\ No newline at end of file
@@ -0,0 +1,16 @@
+from abc import ABC, abstractmethod
+
+from easy_prompting.message import Message
+
+class Tokenizer(ABC):
+    @abstractmethod
+    def count(self, text: str) -> int:
+        pass
+
+    def get_name(self) -> str:
+        return type(self).__qualname__
+
+class ContextPolicy(ABC):
+    @abstractmethod
+    def apply(self, messages: list[Message]) -> list[Message]:
+        pass
\ No newline at end of file
@@ -0,0 +1,74 @@
+from typing import Any, Callable, Iterable, Optional
+
+from easy_prompting.message import Message
+from easy_prompting.utils import hash_str, chain_hash
+
+class History:
+    __slots__ = ("_parent", "_message", "_length", "_digest", "_load")
+
+    def __init__(self, parent: Optional["History"] = None, message: Optional[Message] = None):
+        self._parent = parent
+        self._message = message
+        self._load: Optional[Callable[[], Message]] = None
+        if parent is None or message is None:
+            self._length = 0
+            self._digest = ""
+        else:
+            self._length = parent._length + 1
+            self._digest = chain_hash(parent._digest, message.get_hash())
+
+    @staticmethod
+    def from_messages(messages: Iterable[Message]) -> "History":
+        history = History()
+        for message in messages:
+            history = history.add(message)
+        return history
+
+    @staticmethod
+    def from_digest(parent: "History", digest: str, load: Callable[[], Message]) -> "History":
+        history = History.__new__(History)
+        history._parent = parent
+        history._message = None
+        history._length = parent._length + 1
+        history._digest = digest
+        history._load = load
+        return history
+
+    def add(self, message: Message) -> "History":
+        return History(self, message)
+
+    def get_parent(self) -> Optional["History"]:
+        return self._parent
+
+    def get_message(self) -> Optional[Message]:
+        if self._load is not None:
+            message = self._load()
+            if self._parent is None or chain_hash(self._parent._digest, message.get_hash()) != self._digest:
+                raise ValueError(f"The message of the conversation {self._digest} does not match its digest")
+            self._message = message
+            self._load = None
+        return self._message
+
+    def get_length(self) -> int:
+        return self._length
+
+    def get_digest(self) -> str:
+        return self._digest
+
+    def get_key(self, fingerprint: str, stop: Optional[str] = None) -> str:
+        return chain_hash(self._digest, hash_str(f"{fingerprint}\n{stop!r}"))
+
+    def get_messages(self) -> list[Message]:
+        messages: list[Message] = []
+        history: Optional[History] = self
+        while history is not None and history._length > 0:
+            messages.append(history.get_message())
+            history = history._parent
+        messages.reverse()
+        return messages
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return History.from_messages, (self.get_messages(),)
+
+    def __len__(self) -> int:
+        return self._length
\ No newline at end of file
@@ -1,14 +1,91 @@
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, Callable, Optional, Self, override
+
+from easy_prompting.message import Role, Message
+from easy_prompting.utils import hash_str
 
 class ExtractionError(Exception):
     pass
 
+class Parser(ABC):
+    @abstractmethod
+    def feed(self, data: str) -> None:
+        pass
+
+    def is_done(self) -> bool:
+        return False
+
+    @abstractmethod
+    def close(self) -> Any:
+        pass
+
+class TextParser(Parser):
+    def __init__(self, extractor: Callable[[str], Any]):
+        self._extractor = extractor
+        self._chunks: list[str] = []
+
+    @override
+    def feed(self, data: str) -> None:
+        self._chunks.append(data)
+
+    @override
+    def close(self) -> Any:
+        return self._extractor("".join(self._chunks))
+
 class Instruction(ABC):
+    _compiled: bool = False
+    _description: Optional[str] = None
+    _hash: Optional[str] = None
+    _messages: Optional[dict[Role, Message]] = None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        if self._compiled:
+            raise AttributeError(f"Compiled instructions are immutable: can not set {name!r} of {type(self).__name__}")
+        super().__setattr__(name, value)
+
     @abstractmethod
     def describe(self) -> str:
         pass
 
+    def get_description(self) -> str:
+        if not self._compiled:
+            return self.describe()
+        if self._description is None:
+            object.__setattr__(self, "_description", self.describe())
+        return self._description
+
+    def get_hash(self) -> str:
+        if not self._compiled:
+            return hash_str(f"{type(self).__qualname__}\n{self.get_description()}")
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash_str(f"{type(self).__qualname__}\n{self.get_description()}"))
+        return self._hash
+
+    def get_message(self, role: Role = "user") -> Message:
+        if not self._compiled:
+            return Message(self.get_description(), role)
+        if self._messages is None:
+            object.__setattr__(self, "_messages", {})
+        message = self._messages.get(role)
+        if message is None:
+            message = self._messages[role] = Message(self.get_description(), role)
+        return message
+
+    def get_children(self) -> list["Instruction"]:
+        return []
+
+    def compile(self) -> Self:
+        for child in self.get_children():
+            child.compile()
+        description = self.describe()
+        object.__setattr__(self, "_compiled", True)
+        object.__setattr__(self, "_description", description)
+        self.get_hash()
+        return self
+
     @abstractmethod
     def extract(self, data: str) -> Any:
-        pass
\ No newline at end of file
+        pass
+
+    def get_parser(self) -> Parser:
+        return TextParser(self.extract)
\ No newline at end of file
@@ -1,12 +1,91 @@
 from abc import ABC, abstractmethod
-from typing import List, Optional
+from typing import TYPE_CHECKING, Any, Iterator, List, Optional, override
+if TYPE_CHECKING: from concurrent.futures import Executor
 
 from easy_prompting.message import Message
 
 class LMError(Exception):
     pass
 
+class RetryError(LMError):
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class PendingError(LMError):
+    def __init__(self, message: str, key: str, namespace: Optional[str] = None):
+        super().__init__(message)
+        self.key = key
+        self.namespace = namespace
+
 class LM(ABC):
     @abstractmethod
     def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
-        pass
\ No newline at end of file
+        pass
+
+    def get_completions(self, messages: List[Message], n: int, stop: Optional[str] = None) -> list[str]:
+        return [self.get_completion(messages, stop) for _ in range(n)]
+
+    def stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        yield self.get_completion(messages, stop)
+
+    def get_namespace(self) -> Optional[str]:
+        return None
+
+    def get_fingerprint(self) -> str:
+        return type(self).__qualname__
+
+    def get_request(self, messages: List[Message], stop: Optional[str] = None) -> dict[str, Any]:
+        return dict(messages=[message.to_dict() for message in messages], stop=stop)
+
+class AsyncLM(ABC):
+    @abstractmethod
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        pass
+
+class ExecutorLM(LM, AsyncLM):
+    def __init__(self, lm: LM, executor: Optional["Executor"] = None):
+        self.set_lm(lm)
+        self.set_executor(executor)
+
+    def set_lm(self, lm: LM) -> None:
+        self._lm = lm
+
+    def get_lm(self) -> LM:
+        return self._lm
+
+    def set_executor(self, executor: Optional["Executor"] = None) -> None:
+        self._executor = executor
+
+    def get_executor(self) -> Optional["Executor"]:
+        return self._executor
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        return self._lm.get_completion(messages, stop)
+
+    @override
+    def get_completions(self, messages: List[Message], n: int, stop: Optional[str] = None) -> list[str]:
+        return self._lm.get_completions(messages, n, stop)
+
+    @override
+    def stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        return self._lm.stream_completion(messages, stop)
+
+    @override
+    def get_namespace(self) -> Optional[str]:
+        return self._lm.get_namespace()
+
+    @override
+    def get_fingerprint(self) -> str:
+        return self._lm.get_fingerprint()
+
+    @override
+    def get_request(self, messages: List[Message], stop: Optional[str] = None) -> dict[str, Any]:
+        return self._lm.get_request(messages, stop)
+
+    @override
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        import asyncio
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._lm.get_completion, messages, stop)
\ No newline at end of file
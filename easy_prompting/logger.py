@@ -23,10 +23,23 @@ class Logger(ABC):
         if self._verbose:
             self._log(message, idx, tag)
 
+    def log_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        if self._verbose:
+            self._log_chunk(chunk, idx, tag)
+
+    def end_stream(self, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        self._end_stream(idx, tag)
+
     @abstractmethod
     def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
         pass
 
+    def _log_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        pass
+
+    def _end_stream(self, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        pass
+
     @abstractmethod
     def close(self) -> None:
         pass
\ No newline at end of file
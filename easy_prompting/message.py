@@ -1,19 +1,54 @@
-from typing import Literal
+from typing import TYPE_CHECKING, Any, Literal, Optional
+if TYPE_CHECKING: from easy_prompting.context import Tokenizer
+
+from easy_prompting.utils import hash_str
 
 roles = "user", "assistant", "developer"
 Role = Literal["user", "assistant", "developer"]
 
 class Message:
+    __slots__ = ("_content", "_role", "_hash", "_tokens")
+
     def __init__(self, content: str, role: Role = "user"):
-        self._content = content
-        self._role: Role = role
-    
+        object.__setattr__(self, "_content", content)
+        object.__setattr__(self, "_role", role)
+        object.__setattr__(self, "_hash", None)
+        object.__setattr__(self, "_tokens", None)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"Messages are immutable: can not set {name!r}")
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return Message, (self._content, self._role)
+
     def get_content(self) -> str:
         return self._content
     
     def get_role(self) -> Role:
         return self._role
 
+    def get_hash(self) -> str:
+        if self._hash is None:
+            object.__setattr__(self, "_hash", hash_str(repr(self)))
+        return self._hash
+
+    def count_tokens(self, tokenizer: "Tokenizer") -> int:
+        if self._tokens is None:
+            object.__setattr__(self, "_tokens", {})
+        name = tokenizer.get_name()
+        tokens = self._tokens.get(name)
+        if tokens is None:
+            tokens = self._tokens[name] = tokenizer.count(self._content)
+        return tokens
+
+    def __hash__(self) -> int:
+        return hash(self.get_hash())
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Message):
+            return NotImplemented
+        return self._role == other._role and self._content == other._content
+
     def __repr__(self) -> str:
         return f"Message(role={self._role!r}, content={self._content!r})"
     
@@ -22,4 +57,8 @@ class Message:
 
     @staticmethod
     def length(messages: list['Message']) -> int:
-        return sum(len(message._content) for message in messages)
\ No newline at end of file
+        return sum(len(message._content) for message in messages)
+
+    @staticmethod
+    def count(messages: list['Message'], tokenizer: "Tokenizer") -> int:
+        return sum(message.count_tokens(tokenizer) for message in messages)
\ No newline at end of file
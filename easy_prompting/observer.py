@@ -0,0 +1,72 @@
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Literal, Optional, Self
+
+from easy_prompting.message import Message
+
+@dataclass(frozen=True)
+class Span:
+    name: str
+    duration: float
+
+@dataclass
+class Report:
+    tag: Optional[str]
+    kind: Literal["completion", "data"]
+    time: float
+    duration: float = 0
+    key: Optional[str] = None
+    cache_hit: Optional[bool] = None
+    prompt_messages: int = 0
+    prompt_chars: int = 0
+    completion_chars: int = 0
+    ttft: Optional[float] = None
+    error: Optional[str] = None
+    spans: list[Span] = field(default_factory=list)
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans.append(Span(name, time.perf_counter() - start))
+
+    def set_prompt(self, messages: list[Message]) -> None:
+        self.prompt_messages = len(messages)
+        self.prompt_chars = sum(len(message.get_content()) for message in messages)
+
+    def get_span(self, name: str) -> float:
+        return sum(span.duration for span in self.spans if span.name == name)
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            tag=self.tag,
+            kind=self.kind,
+            time=self.time,
+            duration=self.duration,
+            key=self.key,
+            cache_hit=self.cache_hit,
+            prompt_messages=self.prompt_messages,
+            prompt_chars=self.prompt_chars,
+            completion_chars=self.completion_chars,
+            ttft=self.ttft,
+            error=self.error,
+            spans=[dict(name=span.name, duration=span.duration) for span in self.spans]
+        )
+
+class Observer(ABC):
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    @abstractmethod
+    def observe(self, report: Report) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
\ No newline at end of file
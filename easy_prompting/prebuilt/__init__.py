@@ -1,6 +1,44 @@
+from importlib import import_module
+from typing import TYPE_CHECKING, Any
+
 from easy_prompting import *
 from easy_prompting.utils import pad_text, scope_text, enumerate_text, list_text, wrap_text, multi_str
-from easy_prompting.prebuilt.instructions import DataInstr, CodeInstr, ContextInstr, ListInstr, ListItem, ChoiceItem, ChoiceInstr, extract_code, delimit_code
-from easy_prompting.prebuilt.debuggers import PrintDebugger
-from easy_prompting.prebuilt.loggers import message_to_str, FileLogger, PrintLogger, FuncLogger, MultiLogger, ReadableLogger
-from easy_prompting.prebuilt.gpt import GPT
\ No newline at end of file
+if TYPE_CHECKING:
+    from easy_prompting.prebuilt.instructions import DataInstr, CodeInstr, ContextInstr, ListInstr, ListItem, ChoiceItem, ChoiceInstr, extract_code, delimit_code
+    from easy_prompting.prebuilt.debuggers import PrintDebugger
+    from easy_prompting.prebuilt.loggers import message_to_str, message_to_json, chunk_to_str, FileLogger, JSONLogger, BackgroundLogger, PrintLogger, FuncLogger, MultiLogger, ReadableLogger
+    from easy_prompting.prebuilt.limits import Backoff, RateLimiter, RetryLM, call_limited, call_limited_async, stream_limited
+    from easy_prompting.prebuilt.gpt import GPT
+    from easy_prompting.prebuilt.caches import SQLiteCache, MemoryCache, is_archive, open_cache, export_cache, import_archive, import_cache, format_age, get_cache_stats
+    from easy_prompting.prebuilt.lms import FakeLM, ReplayLM, TranscriptLM, HedgedLM
+    from easy_prompting.prebuilt.observers import group_tag, percentiles, MetricsObserver, FileObserver, MultiObserver
+    from easy_prompting.prebuilt.contexts import CharTokenizer, RegexTokenizer, TiktokenTokenizer, WindowPolicy
+    from easy_prompting.prebuilt.workflow import Step, Workflow
+    from easy_prompting.prebuilt.datasets import read_records, read_done, load_instruction, run_dataset
+
+_exports = {
+    "instructions": ["DataInstr", "CodeInstr", "ContextInstr", "ListInstr", "ListItem", "ChoiceItem", "ChoiceInstr", "extract_code", "delimit_code"],
+    "debuggers": ["PrintDebugger"],
+    "loggers": ["message_to_str", "message_to_json", "chunk_to_str", "FileLogger", "JSONLogger", "BackgroundLogger", "PrintLogger", "FuncLogger", "MultiLogger", "ReadableLogger"],
+    "limits": ["Backoff", "RateLimiter", "RetryLM", "call_limited", "call_limited_async", "stream_limited"],
+    "gpt": ["GPT"],
+    "caches": ["SQLiteCache", "MemoryCache", "is_archive", "open_cache", "export_cache", "import_archive", "import_cache", "format_age", "get_cache_stats"],
+    "lms": ["FakeLM", "ReplayLM", "TranscriptLM", "HedgedLM"],
+    "observers": ["group_tag", "percentiles", "MetricsObserver", "FileObserver", "MultiObserver"],
+    "contexts": ["CharTokenizer", "RegexTokenizer", "TiktokenTokenizer", "WindowPolicy"],
+    "workflow": ["Step", "Workflow"],
+    "datasets": ["read_records", "read_done", "load_instruction", "run_dataset"]
+}
+_modules = {name: module for module, names in _exports.items() for name in names}
+__all__ = [name for name in globals() if not name.startswith("_") and name not in ("import_module", "TYPE_CHECKING", "Any")] + list(_modules)
+
+def __getattr__(name: str) -> Any:
+    module = _modules.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(f"{__name__}.{module}"), name)
+    globals()[name] = value
+    return value
+
+def __dir__() -> list[str]:
+    return sorted(set(globals()) | set(_modules))
\ No newline at end of file
@@ -0,0 +1,373 @@
+import io
+import sqlite3
+import tarfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ContextManager, Iterator, Optional, override
+
+from easy_prompting.cache import CachePolicy, Cache, DirCache, copy_cache
+from easy_prompting.utils import create_dir
+
+class SQLiteCache(Cache):
+    @override
+    def __init__(self, file_path: str | Path, batch_size: int = 1, timeout: float = 60, lease: float = 600):
+        super().__init__()
+        self._mutex = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._local = threading.local()
+        self._pending: dict[tuple[Optional[str], str], Optional[str]] = {}
+        self._connections: list[sqlite3.Connection] = []
+        self.set_file_path(file_path)
+        self.set_batch_size(batch_size)
+        self.set_timeout(timeout)
+        self.set_lease(lease)
+
+    def set_file_path(self, file_path: str | Path) -> None:
+        self._file_path = Path(file_path)
+        create_dir(self._file_path.parent)
+
+    def get_file_path(self) -> Path:
+        return self._file_path
+
+    def set_batch_size(self, batch_size: int = 1) -> None:
+        self._batch_size = batch_size
+
+    def get_batch_size(self) -> int:
+        return self._batch_size
+
+    def set_timeout(self, timeout: float = 60) -> None:
+        self._timeout = timeout
+
+    def get_timeout(self) -> float:
+        return self._timeout
+
+    def set_lease(self, lease: float = 600) -> None:
+        self._lease = lease
+
+    def get_lease(self) -> float:
+        return self._lease
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self._file_path, timeout=self._timeout, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("CREATE TABLE IF NOT EXISTS completions (namespace TEXT NOT NULL, key TEXT NOT NULL, text TEXT NOT NULL, size INTEGER NOT NULL, time REAL NOT NULL, PRIMARY KEY (namespace, key))")
+            connection.execute("CREATE INDEX IF NOT EXISTS completions_time ON completions (namespace, time)")
+            connection.execute("CREATE TABLE IF NOT EXISTS leases (namespace TEXT NOT NULL, key TEXT NOT NULL, time REAL NOT NULL, PRIMARY KEY (namespace, key))")
+            self._local.connection = connection
+            with self._mutex:
+                self._connections.append(connection)
+        return connection
+
+    @override
+    def load(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        with self._mutex:
+            if (namespace, key) in self._pending:
+                return self._pending[namespace, key]
+        row = self._get_connection().execute(
+            "SELECT text, time FROM completions WHERE namespace = ? AND key = ?",
+            (namespace or "", key)
+        ).fetchone()
+        if row is None or self._is_expired(namespace, row[1]):
+            return None
+        return row[0]
+
+    @override
+    def save(self, key: str, text: Optional[str], namespace: Optional[str] = None) -> None:
+        with self._mutex:
+            self._pending[namespace, key] = text
+            full = len(self._pending) >= self._batch_size
+        if full:
+            self.flush()
+        if text is not None:
+            self._count_save(namespace)
+
+    @override
+    def get_namespaces(self) -> Iterator[Optional[str]]:
+        self.flush()
+        for (namespace,) in self._get_connection().execute("SELECT DISTINCT namespace FROM completions").fetchall():
+            yield namespace or None
+
+    @override
+    def get_entries(self, namespace: Optional[str] = None) -> Iterator[tuple[str, int, float]]:
+        self.flush()
+        yield from self._get_connection().execute(
+            "SELECT key, size, time FROM completions WHERE namespace = ?",
+            (namespace or "",)
+        ).fetchall()
+
+    @override
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._mutex:
+                pending = self._pending.copy()
+            if len(pending) == 0:
+                return
+            now = time.time()
+            with self._get_connection() as connection:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO completions (namespace, key, text, size, time) VALUES (?, ?, ?, ?, ?)",
+                    [(namespace or "", key, text, len(text.encode()), now) for (namespace, key), text in pending.items() if text is not None]
+                )
+                connection.executemany(
+                    "DELETE FROM completions WHERE namespace = ? AND key = ?",
+                    [(namespace or "", key) for (namespace, key), text in pending.items() if text is None]
+                )
+            with self._mutex:
+                for entry, text in pending.items():
+                    if self._pending.get(entry, text) is text:
+                        self._pending.pop(entry, None)
+
+    @override
+    @contextmanager
+    def _lock(self, key: str, namespace: Optional[str] = None) -> Iterator[None]:
+        connection = self._get_connection()
+        while True:
+            try:
+                with connection:
+                    connection.execute("DELETE FROM leases WHERE namespace = ? AND key = ? AND time < ?", (namespace or "", key, time.time() - self._lease))
+                    connection.execute("INSERT INTO leases (namespace, key, time) VALUES (?, ?, ?)", (namespace or "", key, time.time()))
+                break
+            except sqlite3.IntegrityError:
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            self.flush()
+            with connection:
+                connection.execute("DELETE FROM leases WHERE namespace = ? AND key = ?", (namespace or "", key))
+
+    @override
+    def compact(self) -> int:
+        self.flush()
+        connection = self._get_connection()
+        with connection:
+            count = connection.execute("DELETE FROM leases WHERE time < ?", (time.time() - self._lease,)).rowcount
+        connection.execute("VACUUM")
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return count
+
+    @override
+    def close(self) -> None:
+        self.flush()
+        with self._mutex:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+        self._local = threading.local()
+
+class MemoryCache(Cache):
+    @override
+    def __init__(self, cache: Cache, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        super().__init__()
+        self._mutex = threading.Lock()
+        self._entries: OrderedDict[tuple[Optional[str], str], tuple[str, int, float]] = OrderedDict()
+        self._bytes = 0
+        self.set_cache(cache)
+        self.set_limits(max_entries, max_bytes)
+        self.reset_stats()
+
+    def set_cache(self, cache: Cache) -> None:
+        self._cache = cache
+
+    def get_cache(self) -> Cache:
+        return self._cache
+
+    def set_limits(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        with self._mutex:
+            self._max_entries = max_entries
+            self._max_bytes = max_bytes
+            self._evict()
+
+    def get_limits(self) -> tuple[Optional[int], Optional[int]]:
+        return self._max_entries, self._max_bytes
+
+    def reset_stats(self) -> None:
+        with self._mutex:
+            self._hits = self._misses = self._evictions = self._bytes_served = 0
+
+    def get_stats(self) -> dict[str, int]:
+        with self._mutex:
+            return dict(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                bytes_served=self._bytes_served,
+                entries=len(self._entries),
+                bytes=self._bytes
+            )
+
+    def _evict(self) -> None:
+        while len(self._entries) > 0 and (
+            (self._max_entries is not None and len(self._entries) > self._max_entries)
+            or (self._max_bytes is not None and self._bytes > self._max_bytes)
+        ):
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            self._evictions += 1
+
+    def _remember(self, key: str, text: Optional[str], namespace: Optional[str] = None) -> None:
+        if (namespace, key) in self._entries:
+            self._bytes -= self._entries.pop((namespace, key))[1]
+        if text is not None:
+            size = len(text.encode())
+            self._entries[namespace, key] = (text, size, time.time())
+            self._bytes += size
+            self._evict()
+
+    def _load(self, key: str, namespace: Optional[str] = None, count: bool = True) -> Optional[str]:
+        with self._mutex:
+            entry = self._entries.get((namespace, key))
+            if entry is not None and not self._is_expired(namespace, entry[2]):
+                self._entries.move_to_end((namespace, key))
+                if count:
+                    self._hits += 1
+                    self._bytes_served += entry[1]
+                return entry[0]
+            if count:
+                self._misses += 1
+        text = (self._cache.load if count else self._cache.peek)(key, namespace)
+        with self._mutex:
+            self._remember(key, text, namespace)
+        return text
+
+    @override
+    def load(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        return self._load(key, namespace)
+
+    @override
+    def peek(self, key: str, namespace: Optional[str] = None) -> Optional[str]:
+        return self._load(key, namespace, False)
+
+    @override
+    def save(self, key: str, text: Optional[str], namespace: Optional[str] = None) -> None:
+        self._cache.save(key, text, namespace)
+        with self._mutex:
+            self._remember(key, text, namespace)
+
+    @override
+    def get_namespaces(self) -> Iterator[Optional[str]]:
+        return self._cache.get_namespaces()
+
+    @override
+    def get_entries(self, namespace: Optional[str] = None) -> Iterator[tuple[str, int, float]]:
+        return self._cache.get_entries(namespace)
+
+    @override
+    def set_policy(self, namespace: Optional[str] = None, ttl: Optional[float] = None, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> None:
+        self._cache.set_policy(namespace, ttl, max_entries, max_bytes)
+
+    @override
+    def get_policy(self, namespace: Optional[str] = None) -> CachePolicy:
+        return self._cache.get_policy(namespace)
+
+    @override
+    def set_prune_interval(self, prune_interval: int = 100) -> None:
+        self._cache.set_prune_interval(prune_interval)
+
+    @override
+    def get_prune_interval(self) -> int:
+        return self._cache.get_prune_interval()
+
+    @override
+    def prune(self, namespace: Optional[str] = None, ttl: Optional[float] = None, max_entries: Optional[int] = None, max_bytes: Optional[int] = None) -> int:
+        count = self._cache.prune(namespace, ttl, max_entries, max_bytes)
+        with self._mutex:
+            for entry in [entry for entry in self._entries if entry[0] == namespace]:
+                self._bytes -= self._entries.pop(entry)[1]
+        return count
+
+    @override
+    def lock(self, key: str, namespace: Optional[str] = None) -> ContextManager[None]:
+        return self._cache.lock(key, namespace)
+
+    @override
+    def flush(self) -> None:
+        self._cache.flush()
+
+    @override
+    def compact(self) -> int:
+        return self._cache.compact()
+
+    @override
+    def close(self) -> None:
+        self._cache.close()
+
+def is_archive(path: str | Path) -> bool:
+    return Path(path).name.endswith((".tar", ".tar.gz", ".tgz"))
+
+def open_cache(path: str | Path) -> Cache:
+    path = Path(path)
+    if is_archive(path):
+        raise ValueError(f"The archive \"{path}\" has to be imported into a cache before it can be used")
+    if path.is_file() or path.suffix in (".db", ".sqlite", ".sqlite3"):
+        return SQLiteCache(path)
+    return DirCache(path)
+
+def export_cache(cache: Cache, archive_path: str | Path) -> int:
+    count = 0
+    with tarfile.open(archive_path, "w" if Path(archive_path).suffix == ".tar" else "w:gz") as archive:
+        for namespace in cache.get_namespaces():
+            for key, _, saved in list(cache.get_entries(namespace)):
+                text = cache.load(key, namespace)
+                if text is not None:
+                    data = text.encode()
+                    info = tarfile.TarInfo(key if namespace is None else f"{namespace}/{key}")
+                    info.size = len(data)
+                    info.mtime = int(saved)
+                    archive.addfile(info, io.BytesIO(data))
+                    count += 1
+    return count
+
+def import_archive(archive_path: str | Path, cache: Cache) -> int:
+    count = 0
+    with tarfile.open(archive_path) as archive:
+        for info in archive:
+            namespace, _, key = info.name.rpartition("/")
+            if not info.isfile() or key.startswith(".") or namespace.startswith(".") or "/" in namespace:
+                continue
+            file = archive.extractfile(info)
+            if file is not None:
+                cache.save(key, file.read().decode(), namespace or None)
+                count += 1
+    cache.flush()
+    return count
+
+def import_cache(src_path: str | Path, dst_path: str | Path) -> int:
+    with open_cache(dst_path) as dst:
+        if isinstance(dst, SQLiteCache):
+            dst.set_batch_size(1024)
+        if is_archive(src_path):
+            return import_archive(src_path, dst)
+        with open_cache(src_path) as src:
+            return copy_cache(src, dst)
+
+def format_age(seconds: float) -> str:
+    for unit, size in (("w", 604800), ("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size and seconds % size == 0:
+            return f"{seconds / size:g}{unit}"
+    return f"{seconds:g}s"
+
+def get_cache_stats(cache: Cache, ages: tuple[float, ...] = (3600, 86400, 604800, 2592000)) -> dict[Optional[str], dict[str, Any]]:
+    now = time.time()
+    stats: dict[Optional[str], dict[str, Any]] = {}
+    for namespace in cache.get_namespaces():
+        entries = list(cache.get_entries(namespace))
+        if len(entries) == 0:
+            continue
+        histogram = [0] * (len(ages) + 1)
+        for _, _, saved in entries:
+            histogram[sum(1 for age in ages if now - saved >= age)] += 1
+        stats[namespace] = dict(
+            entries=len(entries),
+            bytes=sum(size for _, size, _ in entries),
+            oldest=min(saved for _, _, saved in entries),
+            newest=max(saved for _, _, saved in entries),
+            ages=dict(zip([f"<{format_age(age)}" for age in ages] + [f">={format_age(ages[-1])}"], histogram))
+        )
+    return stats
\ No newline at end of file
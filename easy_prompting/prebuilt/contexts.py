@@ -0,0 +1,90 @@
+import re
+import math
+from typing import Any, Sequence, override
+
+from easy_prompting.context import Tokenizer, ContextPolicy
+from easy_prompting.lm import LMError
+from easy_prompting.message import Message, Role
+
+class CharTokenizer(Tokenizer):
+    def __init__(self, chars_per_token: float = 4):
+        self._chars_per_token = chars_per_token
+
+    @override
+    def count(self, text: str) -> int:
+        return math.ceil(len(text) / self._chars_per_token)
+
+    @override
+    def get_name(self) -> str:
+        return f"{super().get_name()}({self._chars_per_token})"
+
+class RegexTokenizer(Tokenizer):
+    _pattern = re.compile(r"\w{1,4}|[^\w\s]|\s+")
+
+    @override
+    def count(self, text: str) -> int:
+        return sum(1 for _ in RegexTokenizer._pattern.finditer(text))
+
+class TiktokenTokenizer(Tokenizer):
+    def __init__(self, encoding_name: str = "o200k_base"):
+        try:
+            import tiktoken
+        except ImportError as e:
+            raise LMError("The \"tiktoken\" library has to be manually installed to use the prebuilt TiktokenTokenizer") from e
+        self._encoding_name = encoding_name
+        self._encoding: Any = tiktoken.get_encoding(encoding_name)
+
+    @override
+    def count(self, text: str) -> int:
+        return len(self._encoding.encode(text, disallowed_special=()))
+
+    @override
+    def get_name(self) -> str:
+        return f"{super().get_name()}({self._encoding_name})"
+
+class WindowPolicy(ContextPolicy):
+    def __init__(self, tokenizer: Tokenizer, max_tokens: int, keep: Sequence[Role] = ("developer",), overhead: int = 4):
+        self.set_tokenizer(tokenizer)
+        self.set_max_tokens(max_tokens)
+        self.set_keep(keep)
+        self.set_overhead(overhead)
+
+    def set_tokenizer(self, tokenizer: Tokenizer) -> None:
+        self._tokenizer = tokenizer
+
+    def get_tokenizer(self) -> Tokenizer:
+        return self._tokenizer
+
+    def set_max_tokens(self, max_tokens: int) -> None:
+        self._max_tokens = max_tokens
+
+    def get_max_tokens(self) -> int:
+        return self._max_tokens
+
+    def set_keep(self, keep: Sequence[Role] = ("developer",)) -> None:
+        self._keep = tuple(keep)
+
+    def get_keep(self) -> tuple[Role, ...]:
+        return self._keep
+
+    def set_overhead(self, overhead: int = 4) -> None:
+        self._overhead = overhead
+
+    def get_overhead(self) -> int:
+        return self._overhead
+
+    def _count(self, message: Message) -> int:
+        return message.count_tokens(self._tokenizer) + self._overhead
+
+    @override
+    def apply(self, messages: list[Message]) -> list[Message]:
+        budget = self._max_tokens - sum(self._count(message) for message in messages if message.get_role() in self._keep)
+        start = len(messages)
+        for i in range(len(messages) - 1, -1, -1):
+            if messages[i].get_role() in self._keep:
+                continue
+            budget -= self._count(messages[i])
+            if budget < 0 and i < len(messages) - 1:
+                break
+            start = i
+        return [message for i, message in enumerate(messages) if message.get_role() in self._keep or i >= start]
\ No newline at end of file
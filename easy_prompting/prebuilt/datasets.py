@@ -0,0 +1,98 @@
+import json
+import time
+from importlib import import_module
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from easy_prompting.message import Role
+from easy_prompting.lm import LMError
+from easy_prompting.instruction import ExtractionError, Instruction
+from easy_prompting.prompter import Prompter
+from easy_prompting.utils import create_dir, truncate_line
+
+def read_records(file_path: str | Path, id_field: Optional[str] = "id") -> Iterator[tuple[str, dict[str, Any]]]:
+    with Path(file_path).open(encoding="utf-8") as file:
+        for i, line in enumerate(file):
+            if line.strip() == "":
+                continue
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                record = dict(value=record)
+            yield str(record[id_field] if id_field is not None and id_field in record else i), record
+
+def read_done(file_path: str | Path) -> set[str]:
+    done: set[str] = set()
+    file_path = Path(file_path)
+    if not file_path.exists():
+        return done
+    with file_path.open(encoding="utf-8") as file:
+        for line in file:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(result, dict) and "id" in result and "error" not in result:
+                done.add(str(result["id"]))
+    return done
+
+def load_instruction(name: str) -> Instruction:
+    module_name, _, attr = name.partition(":")
+    if attr == "":
+        raise ValueError(f"Invalid instruction: \"{name}\" (expected \"module:attribute\")")
+    instruction = import_module(module_name)
+    for part in attr.split("."):
+        instruction = getattr(instruction, part)
+    if not isinstance(instruction, Instruction) and callable(instruction):
+        instruction = instruction()
+    if not isinstance(instruction, Instruction):
+        raise ValueError(f"Invalid instruction: \"{name}\" is not an instruction")
+    return instruction
+
+def run_dataset(prompter: Prompter, instruction: Instruction, template: str, input_path: str | Path, output_path: str | Path, id_field: Optional[str] = "id", role: Role = "user", max_workers: int = 8, progress: Optional[Callable[[dict[str, Any]], Any]] = None) -> dict[str, Any]:
+    output_path = Path(output_path)
+    done = read_done(output_path)
+    stats: dict[str, Any] = dict(completed=0, failed=0, skipped=0, elapsed=0.0, records_per_second=0.0)
+    start = time.perf_counter()
+
+    def run(record_id: str, record: dict[str, Any]) -> dict[str, Any]:
+        copy = prompter.get_copy()
+        copy.set_tag(record_id if prompter.get_tag() is None else f"{prompter.get_tag()}/{record_id}")
+        try:
+            copy.add_message(template.format_map(record), role)
+            return dict(id=record_id, data=copy.get_data(instruction, role=role))
+        except (ExtractionError, LMError, KeyError) as e:
+            return dict(id=record_id, error=f"{type(e).__name__}: {e}")
+
+    def report(result: dict[str, Any]) -> None:
+        stats["failed" if "error" in result else "completed"] += 1
+        stats["elapsed"] = time.perf_counter() - start
+        stats["records_per_second"] = (stats["completed"] + stats["failed"]) / stats["elapsed"] if stats["elapsed"] > 0 else 0.0
+        if progress is not None:
+            progress(stats)
+
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+    create_dir(output_path.parent)
+    truncate_line(output_path)
+    with ThreadPoolExecutor(max_workers) as executor, output_path.open("a", encoding="utf-8") as file:
+        running: set[Future[dict[str, Any]]] = set()
+
+        def finish(futures: set[Future[dict[str, Any]]]) -> None:
+            for future in futures:
+                result = future.result()
+                file.write(json.dumps(result, ensure_ascii=False, default=str) + "\n")
+                file.flush()
+                report(result)
+
+        for record_id, record in read_records(input_path, id_field):
+            if record_id in done:
+                stats["skipped"] += 1
+                continue
+            finished, running = wait(running, None if len(running) >= 2 * max_workers else 0, FIRST_COMPLETED)
+            finish(finished)
+            running.add(executor.submit(run, record_id, record))
+            done.add(record_id)
+        while len(running) > 0:
+            finished, running = wait(running, return_when=FIRST_COMPLETED)
+            finish(finished)
+    stats["elapsed"] = time.perf_counter() - start
+    return stats
\ No newline at end of file
@@ -1,28 +1,66 @@
 import os
-from typing import List, Optional, Any, override
+import json
+import threading
+from typing import Callable, Iterator, List, Optional, Any, override
 
-from easy_prompting.lm import LMError, LM
+from easy_prompting.lm import LMError, RetryError, LM, AsyncLM
 from easy_prompting.message import Message
+from easy_prompting.context import Tokenizer
+from easy_prompting.prebuilt.contexts import CharTokenizer
+from easy_prompting.prebuilt.limits import Backoff, RateLimiter, call_limited, call_limited_async, stream_limited
 
-class GPT(LM):
+def _get_retry_after(e: Any) -> Optional[float]:
+    headers = getattr(getattr(e, "response", None), "headers", None)
+    if headers is None:
+        return None
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after") is not None:
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+def _convert_error(e: Exception) -> Exception:
+    try:
+        from openai import OpenAIError, RateLimitError, APITimeoutError, APIConnectionError, InternalServerError
+    except ImportError:
+        return e
+    if isinstance(e, (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)):
+        return RetryError(str(e), _get_retry_after(e))
+    if isinstance(e, OpenAIError):
+        return LMError(str(e))
+    return e
+
+class GPT(LM, AsyncLM):
     _client: Any = None
+    _async_client: Any = None
+    _limiters: dict[str, RateLimiter] = {}
+    _lock = threading.Lock()
 
     @staticmethod
     def load_client() -> Any:
-        if GPT._client is None:
+        if GPT._client is not None and GPT._async_client is not None:
+            return
+        with GPT._lock:
+            if GPT._client is not None and GPT._async_client is not None:
+                return
             try:
-                from openai import OpenAI
+                from openai import OpenAI, AsyncOpenAI
             except ImportError as e:
                 raise LMError("The \"openai\" library has to be manually installed to use the prebuilt GPT implementation") from e
             api_key = os.getenv("OPENAI_API_KEY", None)
             if api_key is None:
                 raise LMError("The OPENAI_API_KEY environemnt variable has to be set to a valid OpenAI API Key to use the prebuilt GPT implementation")
             GPT._client = OpenAI(api_key=api_key)
+            GPT._async_client = AsyncOpenAI(api_key=api_key)
 
     def __init__(self, model_name: str = "gpt-4o-mini"):
-        GPT.load_client()
         self._model_name = model_name
         self.set_config()
+        self.set_backoff()
+        self.set_tokenizer()
 
     def set_config(self, **config: Any) -> 'GPT':
         self._config = config
@@ -31,12 +69,113 @@ class GPT(LM):
     def get_config(self) -> dict[str, Any]:
         return self._config
 
+    def get_model_name(self) -> str:
+        return self._model_name
+
+    def set_limits(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, burst: float = 1) -> 'GPT':
+        if requests_per_minute is None and tokens_per_minute is None:
+            GPT._limiters.pop(self._model_name, None)
+        else:
+            GPT._limiters[self._model_name] = RateLimiter(requests_per_minute, tokens_per_minute, burst)
+        return self
+
+    def get_limiter(self) -> Optional[RateLimiter]:
+        return GPT._limiters.get(self._model_name)
+
+    def set_backoff(self, backoff: Optional[Backoff] = None) -> 'GPT':
+        self._backoff = backoff
+        return self
+
+    def get_backoff(self) -> Optional[Backoff]:
+        return self._backoff
+
+    def set_tokenizer(self, tokenizer: Tokenizer = CharTokenizer()) -> 'GPT':
+        self._tokenizer = tokenizer
+        return self
+
+    def get_tokenizer(self) -> Tokenizer:
+        return self._tokenizer
+
+    def _count(self, messages: List[Message], n: int = 1) -> tuple[int, Callable[[str], int]]:
+        if self.get_limiter() is None:
+            return 0, lambda completion: 0
+        prompt = Message.count(messages, self._tokenizer)
+        completion_tokens = self._config.get("max_completion_tokens", self._config.get("max_tokens", 256))
+        return prompt + n * completion_tokens, lambda completion: prompt + self._tokenizer.count(completion)
+
+    def _get_client(self, is_async: bool = False) -> Any:
+        GPT.load_client()
+        client = GPT._async_client if is_async else GPT._client
+        return client if self._backoff is None else client.with_options(max_retries=0)
+
+    @override
+    def get_namespace(self) -> Optional[str]:
+        return self._model_name
+
+    @override
+    def get_fingerprint(self) -> str:
+        return json.dumps(dict(model=self._model_name, config=self._config), sort_keys=True, default=repr)
+
+    @override
+    def get_request(self, messages: List[Message], stop: Optional[str] = None) -> dict[str, Any]:
+        return dict(messages=[message.to_dict() for message in messages], stop=stop, model=self._model_name, **self._config)
+
+    def _get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        try:
+            return self._get_client().chat.completions.create(**self.get_request(messages, stop)).choices[0].message.content
+        except Exception as e:
+            error = _convert_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+    def _get_completions(self, messages: List[Message], n: int, stop: Optional[str] = None) -> list[str]:
+        try:
+            choices = self._get_client().chat.completions.create(**dict(self.get_request(messages, stop), n=n)).choices
+            return [choice.message.content for choice in sorted(choices, key=lambda choice: choice.index)]
+        except Exception as e:
+            error = _convert_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+    def _stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        try:
+            with self._get_client().chat.completions.create(**self.get_request(messages, stop), stream=True) as stream:
+                for chunk in stream:
+                    if len(chunk.choices) > 0 and chunk.choices[0].delta.content:
+                        yield chunk.choices[0].delta.content
+        except Exception as e:
+            error = _convert_error(e)
+            if error is e:
+                raise
+            raise error from e
+
+    async def _get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        try:
+            return (await self._get_client(True).chat.completions.create(**self.get_request(messages, stop))).choices[0].message.content
+        except Exception as e:
+            error = _convert_error(e)
+            if error is e:
+                raise
+            raise error from e
+
     @override
     def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
-        openai_messages = [message.to_dict() for message in messages]
-        return GPT._client.chat.completions.create(
-                messages=openai_messages,
-                stop=stop,
-                model=self._model_name,
-                **self._config
-            ).choices[0].message.content
\ No newline at end of file
+        tokens, count = self._count(messages)
+        return call_limited(lambda: self._get_completion(messages, stop), self.get_limiter(), self._backoff, tokens, count)
+
+    @override
+    def get_completions(self, messages: List[Message], n: int, stop: Optional[str] = None) -> list[str]:
+        tokens, count = self._count(messages, n)
+        return call_limited(lambda: self._get_completions(messages, n, stop), self.get_limiter(), self._backoff, tokens, lambda completions: count("".join(completions)))
+
+    @override
+    def stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        tokens, count = self._count(messages)
+        return stream_limited(lambda: self._stream_completion(messages, stop), self.get_limiter(), self._backoff, tokens, count)
+
+    @override
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        tokens, count = self._count(messages)
+        return await call_limited_async(lambda: self._get_completion_async(messages, stop), self.get_limiter(), self._backoff, tokens, count)
\ No newline at end of file
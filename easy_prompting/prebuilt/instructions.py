@@ -1,7 +1,8 @@
+import re
 from dataclasses import dataclass
-from typing import Any, Callable, Optional, override
+from typing import Any, Callable, Optional, Sequence, override
 
-from easy_prompting.instruction import ExtractionError, Instruction
+from easy_prompting.instruction import ExtractionError, Parser, TextParser, Instruction
 from easy_prompting.utils import scope_text, enumerate_text, list_text
 
 def extract_code(code: str, language: str = "") -> str:
@@ -20,6 +21,122 @@ def extract_code(code: str, language: str = "") -> str:
 def delimit_code(text: str, keyword: str = "") -> str:
     return f"```{keyword}\n{text}\n```"
 
+class CodeParser(TextParser):
+    @override
+    def __init__(self, language: str = ""):
+        super().__init__(lambda data: extract_code(data, language))
+        self._opening = "```" + language
+        self._line = ""
+        self._opened = False
+        self._done = False
+
+    @override
+    def feed(self, data: str) -> None:
+        super().feed(data)
+        if self._done:
+            return
+        lines = (self._line + data).split("\n")
+        self._line = lines.pop()
+        for line in lines:
+            if self._opened and line.startswith("```"):
+                self._done = True
+                return
+            self._opened = self._opened or line.startswith(self._opening)
+        self._done = self._opened and self._line.startswith("```")
+
+    @override
+    def is_done(self) -> bool:
+        return self._done
+
+class ListParser(Parser):
+    def __init__(self, keys: Sequence[str], parsers: Sequence[Parser]):
+        self._keys = keys
+        self._parsers = parsers
+        self._chunks: list[str] = []
+        self._buffer = ""
+        self._found = 0
+
+    def _route(self, data: str) -> None:
+        if self._found > 0 and data != "":
+            self._parsers[self._found - 1].feed(data)
+
+    @override
+    def feed(self, data: str) -> None:
+        self._chunks.append(data)
+        self._buffer += data
+        while self._found < len(self._keys):
+            key = self._keys[self._found]
+            pos = self._buffer.find(key)
+            if pos < 0:
+                safe = max(0, len(self._buffer) - len(key) + 1)
+                self._route(self._buffer[:safe])
+                self._buffer = self._buffer[safe:]
+                return
+            self._route(self._buffer[:pos])
+            self._buffer = self._buffer[pos + len(key):]
+            self._found += 1
+        self._route(self._buffer)
+        self._buffer = ""
+
+    @override
+    def is_done(self) -> bool:
+        return self._found == len(self._keys) and all(parser.is_done() for parser in self._parsers[-1:])
+
+    @override
+    def close(self) -> list[Any]:
+        if self._found < len(self._keys):
+            raise ExtractionError(f"Enumerate extraction failed: key {self._keys[self._found]!r} missing in data {"".join(self._chunks)!r}")
+        return [parser.close() for parser in self._parsers]
+
+class ChoiceParser(Parser):
+    def __init__(self, keys: Sequence[str], instructions: Sequence[Instruction], pattern: re.Pattern[str]):
+        self._keys = keys
+        self._instructions = instructions
+        self._pattern = pattern
+        self._max_length = max((len(key) for key in keys), default=1)
+        self._chunks: list[str] = []
+        self._buffer = ""
+        self._choice: Optional[str] = None
+        self._parser: Optional[Parser] = None
+
+    def _is_pending(self, end: int) -> bool:
+        for start in range(max(0, len(self._buffer) - self._max_length + 1), end + 1):
+            rest = self._buffer[start:]
+            if any(len(key) > len(rest) and key.startswith(rest) for key in self._keys):
+                return True
+        return False
+
+    def _choose(self, final: bool = False) -> None:
+        match = self._pattern.search(self._buffer)
+        if match is not None and (final or not self._is_pending(match.start())):
+            self._choice = match.group()
+            self._parser = self._instructions[self._keys.index(self._choice)].get_parser()
+            self._parser.feed(self._buffer[match.end():])
+            self._buffer = ""
+        elif not final:
+            self._buffer = self._buffer[max(0, len(self._buffer) - self._max_length + 1):]
+
+    @override
+    def feed(self, data: str) -> None:
+        self._chunks.append(data)
+        if self._parser is not None:
+            self._parser.feed(data)
+        else:
+            self._buffer += data
+            self._choose()
+
+    @override
+    def is_done(self) -> bool:
+        return self._parser is not None and self._parser.is_done()
+
+    @override
+    def close(self) -> tuple[str, Any]:
+        if self._parser is None:
+            self._choose(final=True)
+        if self._choice is None or self._parser is None:
+            raise ExtractionError(f"List extraction failed: no valid option key {list(self._keys)!r} found in data {"".join(self._chunks)!r}")
+        return self._choice, self._parser.close()
+
 class DataInstr(Instruction):
     def __init__(self, text: str, extractor: Callable[[str], Any] = lambda x: x.strip()):
         self._text = text
@@ -51,6 +168,10 @@ class CodeInstr(DataInstr):
             )
         )
 
+    @override
+    def get_parser(self) -> Parser:
+        return CodeParser()
+
 class ContextInstr(Instruction):
     def __init__(self, pre: str, instruction: Instruction, post: Optional[str] = None):
         self._pre = pre
@@ -61,7 +182,7 @@ class ContextInstr(Instruction):
     def describe(self) -> str:
         return (
             self._pre
-            + scope_text(self._instruction.describe())
+            + scope_text(self._instruction.get_description())
             + ("" if self._post is None else f"\n-> {self._post}")
         )
 
@@ -69,6 +190,14 @@ class ContextInstr(Instruction):
     def extract(self, data: str, depth: int = 0) -> list[Any]:
         return self._instruction.extract(data)
 
+    @override
+    def get_parser(self) -> Parser:
+        return self._instruction.get_parser()
+
+    @override
+    def get_children(self) -> list[Instruction]:
+        return [self._instruction]
+
 @dataclass
 class ListItem:
     def __init__(self, key: str, instruction: Instruction):
@@ -78,29 +207,29 @@ class ListItem:
 class ListInstr(Instruction):
     def __init__(self, *items: ListItem):
         self._items = items
+        self._keys = [item._key for item in items]
 
     @override
     def describe(self) -> str:
         descriptions: list[str] = []
         for item in self._items:
             descriptions.append(f"Write \"{item._key}\"")
-            descriptions.append(item._instruction.describe())
+            descriptions.append(item._instruction.get_description())
         return enumerate_text(*descriptions)
 
     @override
     def extract(self, data: str) -> list[Any]:
-        _data = data
-        sub_data: list[str] = []
-        for item in self._items:
-            if item._key not in data:
-                raise ExtractionError(f"Enumerate extraction failed: key {item._key!r} missing in data {_data!r}")
-            head, data = data.split(item._key, 1)
-            sub_data.append(head)
-        sub_data = sub_data[1:] + [data]
-        extractions = []
-        for _sub_data, item in zip(sub_data, self._items):
-            extractions.append(item._instruction.extract(_sub_data))
-        return extractions
+        parser = self.get_parser()
+        parser.feed(data)
+        return parser.close()
+
+    @override
+    def get_parser(self) -> ListParser:
+        return ListParser(self._keys, [item._instruction.get_parser() for item in self._items])
+
+    @override
+    def get_children(self) -> list[Instruction]:
+        return [item._instruction for item in self._items]
 
 @dataclass
 class ChoiceItem:
@@ -113,6 +242,8 @@ class ChoiceItem:
 class ChoiceInstr(Instruction):
     def __init__(self, *items: ChoiceItem):
         self._items = items
+        self._keys = [item._key for item in items]
+        self._pattern = re.compile("|".join(re.escape(key) for key in sorted(self._keys, key=len, reverse=True)) or "(?!)")
     
     @override
     def describe(self) -> str:
@@ -122,7 +253,7 @@ class ChoiceInstr(Instruction):
                 item._condition
                 + enumerate_text(
                     f"Write \"{item._key}\"",
-                    item._instruction.describe(),
+                    item._instruction.get_description(),
                     add_scope=True
                 )
                 + ("" if item._effect is None else f"\n-> {item._effect}")
@@ -131,9 +262,14 @@ class ChoiceInstr(Instruction):
 
     @override
     def extract(self, data: str) -> tuple[str, Any]:
-        for item in self._items:
-            if item._key in data:
-                sub_data = data.split(item._key, 1)[1]
-                return item._key, item._instruction.extract(sub_data)
-        keys = [item._key for item in self._items]
-        raise ExtractionError(f"List extraction failed: no valid option key {keys!r} found in data {data!r}")
\ No newline at end of file
+        parser = self.get_parser()
+        parser.feed(data)
+        return parser.close()
+
+    @override
+    def get_parser(self) -> ChoiceParser:
+        return ChoiceParser(self._keys, [item._instruction for item in self._items], self._pattern)
+
+    @override
+    def get_children(self) -> list[Instruction]:
+        return [item._instruction for item in self._items]
\ No newline at end of file
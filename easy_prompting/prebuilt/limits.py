@@ -0,0 +1,208 @@
+import time
+import random
+import threading
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Iterator, List, Optional, TypeVar, override
+
+from easy_prompting.lm import RetryError, LM, AsyncLM, ExecutorLM
+from easy_prompting.message import Message
+from easy_prompting.context import Tokenizer
+from easy_prompting.prebuilt.contexts import CharTokenizer
+
+T = TypeVar("T")
+
+@dataclass(frozen=True)
+class Backoff:
+    retries: int = 5
+    base: float = 1
+    max_delay: float = 60
+
+    def get_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.base / 2)
+        delay = min(self.max_delay, self.base * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+class RateLimiter:
+    def __init__(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, burst: float = 1):
+        self._mutex = threading.Lock()
+        self._requests_ready = self._tokens_ready = self._paused = 0.0
+        self._waited = 0.0
+        self.set_limits(requests_per_minute, tokens_per_minute, burst)
+
+    def set_limits(self, requests_per_minute: Optional[float] = None, tokens_per_minute: Optional[float] = None, burst: float = 1) -> None:
+        self._requests_per_minute = requests_per_minute
+        self._tokens_per_minute = tokens_per_minute
+        self._burst = burst
+
+    def get_limits(self) -> tuple[Optional[float], Optional[float], float]:
+        return self._requests_per_minute, self._tokens_per_minute, self._burst
+
+    def get_waited(self) -> float:
+        return self._waited
+
+    def reserve(self, tokens: int = 0) -> float:
+        with self._mutex:
+            now = time.monotonic()
+            start = max(now, self._paused)
+            ready = start
+            if self._requests_per_minute is not None:
+                ready = max(ready, self._requests_ready - self._burst)
+                self._requests_ready = max(self._requests_ready, start) + 60 / self._requests_per_minute
+            if self._tokens_per_minute is not None:
+                ready = max(ready, self._tokens_ready - self._burst)
+                self._tokens_ready = max(self._tokens_ready, start) + 60 * tokens / self._tokens_per_minute
+            self._waited += ready - now
+            return ready - now
+
+    def settle(self, reserved: int, used: int) -> None:
+        if self._tokens_per_minute is not None:
+            with self._mutex:
+                self._tokens_ready += 60 * (used - reserved) / self._tokens_per_minute
+
+    def pause(self, seconds: float) -> None:
+        with self._mutex:
+            self._paused = max(self._paused, time.monotonic() + seconds)
+
+    def acquire(self, tokens: int = 0) -> None:
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens: int = 0) -> None:
+        import asyncio
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+def call_limited(call: Callable[[], T], limiter: Optional[RateLimiter] = None, backoff: Optional[Backoff] = None, tokens: int = 0, count: Callable[[T], int] = lambda completion: 0) -> T:
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            completion = call()
+        except RetryError as e:
+            if backoff is None or attempt >= backoff.retries:
+                raise
+            if limiter is not None and e.retry_after is not None:
+                limiter.pause(e.retry_after)
+            time.sleep(backoff.get_delay(attempt, e.retry_after))
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.settle(tokens, count(completion))
+        return completion
+
+async def call_limited_async(call: Callable[[], Awaitable[T]], limiter: Optional[RateLimiter] = None, backoff: Optional[Backoff] = None, tokens: int = 0, count: Callable[[T], int] = lambda completion: 0) -> T:
+    import asyncio
+    attempt = 0
+    while True:
+        if limiter is not None:
+            await limiter.acquire_async(tokens)
+        try:
+            completion = await call()
+        except RetryError as e:
+            if backoff is None or attempt >= backoff.retries:
+                raise
+            if limiter is not None and e.retry_after is not None:
+                limiter.pause(e.retry_after)
+            await asyncio.sleep(backoff.get_delay(attempt, e.retry_after))
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.settle(tokens, count(completion))
+        return completion
+
+def stream_limited(stream: Callable[[], Iterator[str]], limiter: Optional[RateLimiter] = None, backoff: Optional[Backoff] = None, tokens: int = 0, count: Callable[[str], int] = lambda completion: 0) -> Iterator[str]:
+    attempt = 0
+    chunks: list[str] = []
+    while True:
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            for chunk in stream():
+                chunks.append(chunk)
+                yield chunk
+        except RetryError as e:
+            if len(chunks) > 0 or backoff is None or attempt >= backoff.retries:
+                raise
+            if limiter is not None and e.retry_after is not None:
+                limiter.pause(e.retry_after)
+            time.sleep(backoff.get_delay(attempt, e.retry_after))
+            attempt += 1
+            continue
+        if limiter is not None:
+            limiter.settle(tokens, count("".join(chunks)))
+        return
+
+class RetryLM(LM, AsyncLM):
+    def __init__(self, lm: LM, limiter: Optional[RateLimiter] = None, backoff: Optional[Backoff] = Backoff(), tokenizer: Tokenizer = CharTokenizer(), completion_tokens: int = 256):
+        self.set_lm(lm)
+        self.set_limiter(limiter)
+        self.set_backoff(backoff)
+        self.set_tokenizer(tokenizer, completion_tokens)
+
+    def set_lm(self, lm: LM) -> None:
+        self._lm = lm
+
+    def get_lm(self) -> LM:
+        return self._lm
+
+    def set_limiter(self, limiter: Optional[RateLimiter] = None) -> None:
+        self._limiter = limiter
+
+    def get_limiter(self) -> Optional[RateLimiter]:
+        return self._limiter
+
+    def set_backoff(self, backoff: Optional[Backoff] = Backoff()) -> None:
+        self._backoff = backoff
+
+    def get_backoff(self) -> Optional[Backoff]:
+        return self._backoff
+
+    def set_tokenizer(self, tokenizer: Tokenizer = CharTokenizer(), completion_tokens: int = 256) -> None:
+        self._tokenizer = tokenizer
+        self._completion_tokens = completion_tokens
+
+    def get_tokenizer(self) -> tuple[Tokenizer, int]:
+        return self._tokenizer, self._completion_tokens
+
+    def _count(self, messages: List[Message], n: int = 1) -> tuple[int, Callable[[str], int]]:
+        if self._limiter is None:
+            return 0, lambda completion: 0
+        prompt = Message.count(messages, self._tokenizer)
+        return prompt + n * self._completion_tokens, lambda completion: prompt + self._tokenizer.count(completion)
+
+    @override
+    def get_namespace(self) -> Optional[str]:
+        return self._lm.get_namespace()
+
+    @override
+    def get_fingerprint(self) -> str:
+        return self._lm.get_fingerprint()
+
+    @override
+    def get_request(self, messages: List[Message], stop: Optional[str] = None) -> dict[str, Any]:
+        return self._lm.get_request(messages, stop)
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        tokens, count = self._count(messages)
+        return call_limited(lambda: self._lm.get_completion(messages, stop), self._limiter, self._backoff, tokens, count)
+
+    @override
+    def get_completions(self, messages: List[Message], n: int, stop: Optional[str] = None) -> list[str]:
+        tokens, count = self._count(messages, n)
+        return call_limited(lambda: self._lm.get_completions(messages, n, stop), self._limiter, self._backoff, tokens, lambda completions: count("".join(completions)))
+
+    @override
+    def stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        tokens, count = self._count(messages)
+        return stream_limited(lambda: self._lm.stream_completion(messages, stop), self._limiter, self._backoff, tokens, count)
+
+    @override
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        lm = self._lm if isinstance(self._lm, AsyncLM) else ExecutorLM(self._lm)
+        tokens, count = self._count(messages)
+        return await call_limited_async(lambda: lm.get_completion_async(messages, stop), self._limiter, self._backoff, tokens, count)
\ No newline at end of file
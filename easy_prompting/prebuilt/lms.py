@@ -0,0 +1,390 @@
+import time
+import json
+import random
+import threading
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, List, Optional, Self, override
+
+from easy_prompting.lm import LMError, LM, AsyncLM, ExecutorLM
+from easy_prompting.message import Message
+from easy_prompting.history import History
+from easy_prompting.cache import Cache, DirCache
+from easy_prompting.prebuilt.observers import percentiles
+
+def _cut(completion: str, stop: Optional[str] = None) -> str:
+    if stop is not None and stop in completion:
+        completion = completion.split(stop, 1)[0]
+    return completion
+
+class FakeLM(LM, AsyncLM):
+    def __init__(self, respond: Callable[[List[Message]], str] = lambda messages: messages[-1].get_content(), seed: Optional[int] = None):
+        self._mutex = threading.Lock()
+        self._calls = 0
+        self.set_respond(respond)
+        self.set_stream()
+        self.set_latency()
+        self.set_throughput()
+        self.set_errors()
+        self.set_seed(seed)
+
+    def set_respond(self, respond: Callable[[List[Message]], str]) -> None:
+        self._respond = respond
+
+    def get_respond(self) -> Callable[[List[Message]], str]:
+        return self._respond
+
+    def set_stream(self, chunk_size: int = 4, delay: float = 0) -> None:
+        self._chunk_size = chunk_size
+        self._delay = delay
+
+    def get_stream(self) -> tuple[int, float]:
+        return self._chunk_size, self._delay
+
+    def set_latency(self, latency: float | Callable[[random.Random], float] = 0) -> None:
+        self._latency = latency
+
+    def get_latency(self) -> float | Callable[[random.Random], float]:
+        return self._latency
+
+    def set_throughput(self, chars_per_second: Optional[float] = None, max_concurrency: Optional[int] = None) -> None:
+        self._chars_per_second = chars_per_second
+        self._max_concurrency = max_concurrency
+        self._slots = None if max_concurrency is None else threading.BoundedSemaphore(max_concurrency)
+
+    def get_throughput(self) -> tuple[Optional[float], Optional[int]]:
+        return self._chars_per_second, self._max_concurrency
+
+    def set_errors(self, rate: float = 0, error: Callable[[], Exception] = lambda: LMError("Injected error of the fake LM")) -> None:
+        self._error_rate = rate
+        self._error = error
+
+    def get_errors(self) -> tuple[float, Callable[[], Exception]]:
+        return self._error_rate, self._error
+
+    def set_seed(self, seed: Optional[int] = None) -> None:
+        self._random = random.Random(seed)
+
+    def get_calls(self) -> int:
+        return self._calls
+
+    def _start(self) -> tuple[float, bool]:
+        with self._mutex:
+            self._calls += 1
+            latency = self._latency(self._random) if callable(self._latency) else self._latency
+            failed = self._error_rate > 0 and self._random.random() < self._error_rate
+        return max(0, latency), failed
+
+    def _get_duration(self, text: str) -> float:
+        if self._chars_per_second is None:
+            return 0
+        return len(text) / self._chars_per_second
+
+    @contextmanager
+    def _enter(self) -> Iterator[None]:
+        if self._slots is None:
+            yield
+            return
+        with self._slots:
+            yield
+
+    def _respond_until(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        return _cut(self._respond(messages), stop)
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        with self._enter():
+            latency, failed = self._start()
+            time.sleep(latency)
+            if failed:
+                raise self._error()
+            completion = self._respond_until(messages, stop)
+            time.sleep(self._get_duration(completion))
+            return completion
+
+    @override
+    def stream_completion(self, messages: List[Message], stop: Optional[str] = None) -> Iterator[str]:
+        with self._enter():
+            latency, failed = self._start()
+            time.sleep(latency)
+            if failed:
+                raise self._error()
+            completion = self._respond_until(messages, stop)
+            for i in range(0, len(completion), self._chunk_size):
+                chunk = completion[i:i+self._chunk_size]
+                time.sleep(self._delay + self._get_duration(chunk))
+                yield chunk
+
+    @override
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        import asyncio
+        if self._slots is not None:
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(0.001)
+        try:
+            latency, failed = self._start()
+            await asyncio.sleep(latency)
+            if failed:
+                raise self._error()
+            completion = self._respond_until(messages, stop)
+            await asyncio.sleep(self._get_duration(completion))
+            return completion
+        finally:
+            if self._slots is not None:
+                self._slots.release()
+
+class ReplayLM(LM):
+    def __init__(self, cache: str | Path | Cache, fingerprint: str, namespace: Optional[str] = None):
+        self.set_cache(cache)
+        self.set_fingerprint(fingerprint)
+        self.set_namespace(namespace)
+
+    def set_cache(self, cache: str | Path | Cache) -> None:
+        self._cache = DirCache(cache) if isinstance(cache, (str, Path)) else cache
+
+    def get_cache(self) -> Cache:
+        return self._cache
+
+    def set_fingerprint(self, fingerprint: str) -> None:
+        self._fingerprint = fingerprint
+
+    @override
+    def get_fingerprint(self) -> str:
+        return self._fingerprint
+
+    def set_namespace(self, namespace: Optional[str] = None) -> None:
+        self._namespace = namespace
+
+    @override
+    def get_namespace(self) -> Optional[str]:
+        return self._namespace
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        key = History.from_messages(messages).get_key(self._fingerprint, stop)
+        completion = self._cache.load(key, self._namespace)
+        if completion is None:
+            raise LMError(f"No completion has been recorded for this conversation (key {key!r})")
+        return completion
+
+class TranscriptLM(LM):
+    def __init__(self, file_path: str | Path):
+        self.set_file_path(file_path)
+
+    def set_file_path(self, file_path: str | Path) -> None:
+        self._file_path = Path(file_path)
+        self._completions: dict[str, str] = {}
+        histories: dict[Optional[str], History] = {}
+        with self._file_path.open(encoding="utf-8") as file:
+            for line in file:
+                if line.strip() == "":
+                    continue
+                record = json.loads(line)
+                tag, idx = record["tag"], record["idx"]
+                history = histories.get(tag)
+                if history is None:
+                    parent = None if tag is None or "/" not in tag else tag.rsplit("/", 1)[0]
+                    history = histories.get(parent, History())
+                while len(history) > idx:
+                    history = history.get_parent()
+                if record["role"] == "assistant":
+                    self._completions[history.get_digest()] = record["content"]
+                histories[tag] = history.add(Message(record["content"], record["role"]))
+
+    def get_file_path(self) -> Path:
+        return self._file_path
+
+    def get_size(self) -> int:
+        return len(self._completions)
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        completion = self._completions.get(History.from_messages(messages).get_digest())
+        if completion is None:
+            raise LMError("No completion has been recorded for this conversation")
+        return _cut(completion, stop)
+
+class _Backend:
+    def __init__(self, lm: LM, max_samples: int):
+        self.lm = lm
+        self.calls = self.errors = self.hedges = self.wins = self.cancelled = 0
+        self.latencies: deque[float] = deque(maxlen=max_samples)
+
+    def to_dict(self) -> dict[str, Any]:
+        return dict(
+            fingerprint=self.lm.get_fingerprint(),
+            calls=self.calls,
+            errors=self.errors,
+            hedges=self.hedges,
+            wins=self.wins,
+            cancelled=self.cancelled,
+            latency=percentiles(list(self.latencies), 50, 95, 99)
+        )
+
+class HedgedLM(LM, AsyncLM):
+    def __init__(self, *lms: LM, percentile: float = 95, delay: float = 1, min_samples: int = 20, max_samples: int = 1000, max_hedges: int = 1, max_workers: int = 32):
+        if len(lms) == 0:
+            raise ValueError("A HedgedLM needs at least one LM")
+        self._mutex = threading.Lock()
+        self._backends = [_Backend(lm, max_samples) for lm in lms]
+        self._executor: Any = None
+        self._max_workers = max_workers
+        self.set_hedging(percentile, delay, min_samples, max_hedges)
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._mutex:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_lms(self) -> list[LM]:
+        return [backend.lm for backend in self._backends]
+
+    def set_hedging(self, percentile: float = 95, delay: float = 1, min_samples: int = 20, max_hedges: int = 1) -> None:
+        self._percentile = percentile
+        self._delay = delay
+        self._min_samples = min_samples
+        self._max_hedges = max_hedges
+
+    def get_hedging(self) -> tuple[float, float, int, int]:
+        return self._percentile, self._delay, self._min_samples, self._max_hedges
+
+    def get_stats(self) -> list[dict[str, Any]]:
+        with self._mutex:
+            return [backend.to_dict() for backend in self._backends]
+
+    def get_threshold(self, idx: int = 0) -> float:
+        with self._mutex:
+            latencies = list(self._backends[idx].latencies)
+        if len(latencies) < self._min_samples:
+            return self._delay
+        return percentiles(latencies, self._percentile)[f"p{self._percentile:g}"] or self._delay
+
+    @override
+    def get_namespace(self) -> Optional[str]:
+        return self._backends[0].lm.get_namespace()
+
+    @override
+    def get_fingerprint(self) -> str:
+        return self._backends[0].lm.get_fingerprint()
+
+    @override
+    def get_request(self, messages: List[Message], stop: Optional[str] = None) -> dict[str, Any]:
+        return self._backends[0].lm.get_request(messages, stop)
+
+    def _start(self, idx: int, hedge: bool) -> float:
+        with self._mutex:
+            self._backends[idx].calls += 1
+            self._backends[idx].hedges += hedge
+        return time.perf_counter()
+
+    def _finish(self, idx: int, start: float, error: Optional[Exception], cancelled: bool = False) -> None:
+        with self._mutex:
+            if error is None:
+                self._backends[idx].latencies.append(time.perf_counter() - start)
+                self._backends[idx].cancelled += cancelled
+            else:
+                self._backends[idx].errors += 1
+
+    def _win(self, idx: int) -> None:
+        with self._mutex:
+            self._backends[idx].wins += 1
+
+    def _call(self, idx: int, hedge: bool, messages: List[Message], stop: Optional[str] = None) -> str:
+        start = self._start(idx, hedge)
+        try:
+            completion = self._backends[idx].lm.get_completion(messages, stop)
+        except Exception as e:
+            self._finish(idx, start, e)
+            raise
+        self._finish(idx, start, None)
+        return completion
+
+    async def _call_async(self, idx: int, hedge: bool, messages: List[Message], stop: Optional[str] = None) -> str:
+        import asyncio
+        lm = self._backends[idx].lm
+        start = self._start(idx, hedge)
+        try:
+            completion = await (lm if isinstance(lm, AsyncLM) else ExecutorLM(lm)).get_completion_async(messages, stop)
+        except asyncio.CancelledError:
+            self._finish(idx, start, None, True)
+            raise
+        except Exception as e:
+            self._finish(idx, start, e)
+            raise
+        self._finish(idx, start, None)
+        return completion
+
+    @override
+    def get_completion(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+        with self._mutex:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self._max_workers)
+        pending = {self._executor.submit(self._call, 0, False, messages, stop): 0}
+        launched = 1
+        hedges = 0
+        error: Optional[LMError] = None
+        while len(pending) > 0:
+            can_hedge = launched < len(self._backends) and hedges < self._max_hedges
+            done, _ = wait(pending, self.get_threshold(pending[next(iter(pending))]) if can_hedge else None, FIRST_COMPLETED)
+            if len(done) == 0:
+                pending[self._executor.submit(self._call, launched, True, messages, stop)] = launched
+                launched += 1
+                hedges += 1
+                continue
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    completion = future.result()
+                except LMError as e:
+                    error = e
+                    if launched < len(self._backends):
+                        pending[self._executor.submit(self._call, launched, False, messages, stop)] = launched
+                        launched += 1
+                    continue
+                self._win(idx)
+                return completion
+        assert error is not None
+        raise error
+
+    @override
+    async def get_completion_async(self, messages: List[Message], stop: Optional[str] = None) -> str:
+        import asyncio
+        pending = {asyncio.ensure_future(self._call_async(0, False, messages, stop)): 0}
+        launched = 1
+        hedges = 0
+        error: Optional[LMError] = None
+        try:
+            while len(pending) > 0:
+                can_hedge = launched < len(self._backends) and hedges < self._max_hedges
+                done, _ = await asyncio.wait(pending, timeout=self.get_threshold(pending[next(iter(pending))]) if can_hedge else None, return_when=asyncio.FIRST_COMPLETED)
+                if len(done) == 0:
+                    pending[asyncio.ensure_future(self._call_async(launched, True, messages, stop))] = launched
+                    launched += 1
+                    hedges += 1
+                    continue
+                for task in done:
+                    idx = pending.pop(task)
+                    try:
+                        completion = task.result()
+                    except LMError as e:
+                        error = e
+                        if launched < len(self._backends):
+                            pending[asyncio.ensure_future(self._call_async(launched, False, messages, stop))] = launched
+                            launched += 1
+                        continue
+                    self._win(idx)
+                    return completion
+        finally:
+            for task in pending:
+                task.cancel()
+        assert error is not None
+        raise error
\ No newline at end of file
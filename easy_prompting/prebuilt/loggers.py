@@ -1,3 +1,9 @@
+import sys
+import json
+import time
+import queue
+import atexit
+import threading
 from pathlib import Path
 from typing import Any, Callable, Literal, Optional, override
 
@@ -11,11 +17,24 @@ def message_to_str(message: Message, idx: Optional[int] = None, tag: Optional[st
         f"\n{pad_text(message.get_content(), padding)}"
     )
 
+def message_to_json(message: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None, start: Optional[float] = None) -> str:
+    return json.dumps(
+        dict(tag=tag, idx=idx, role=message.get_role(), content=message.get_content(), start=timestamp if start is None else start, time=timestamp),
+        ensure_ascii=False
+    )
+
+def chunk_to_str(chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None, padding: str = "  ", first: bool = True) -> str:
+    text = pad_text(chunk.get_content(), padding, pad_first=False)
+    if first:
+        return f"Message(tag={tag!r}, idx={idx}, role={chunk.get_role()!r}):\n{padding}{text}"
+    return text
+
 class PrintLogger(Logger):
     @override
     def __init__(self):
         super().__init__()
         self.set_padding()
+        self._stream: Optional[tuple[Optional[int], Optional[str]]] = None
     
     def set_padding(self, padding: str = "  ") -> None:
         self._padding = padding
@@ -23,9 +42,47 @@ class PrintLogger(Logger):
     def get_padding(self) -> str:
         return self._padding
 
+    def _format(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        if self._stream == (idx, tag):
+            self._stream = None
+            return "\n\n"
+        return message_to_str(message, idx, tag, self._padding) + "\n\n"
+
+    def _format_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        first = self._stream != (idx, tag)
+        self._stream = (idx, tag)
+        return chunk_to_str(chunk, idx, tag, self._padding, first)
+
+    def _format_end(self, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        if self._stream != (idx, tag):
+            return ""
+        self._stream = None
+        return "\n\n"
+
+    def _write(self, text: str) -> None:
+        print(text, end="")
+
+    def _flush(self) -> None:
+        sys.stdout.flush()
+
     @override
     def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
-        print(message_to_str(message, idx, tag, self._padding), end="\n\n", flush=True)
+        self._write(self._format(message, idx, tag, time.time()))
+        self._flush()
+
+    @override
+    def _log_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        text = self._format_chunk(chunk, idx, tag, time.time())
+        if text != "":
+            self._write(text)
+            self._flush()
+
+    @override
+    def _end_stream(self, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        text = self._format_end(idx, tag, time.time())
+        if text != "":
+            self._write(text)
+            self._flush()
 
     @override
     def close(self) -> None:
@@ -42,10 +99,22 @@ class FuncLogger(PrintLogger):
     
     def get_func(self) -> Callable[[str], Any]:
         return self._func
-    
+
     @override
-    def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
-        self._func(message_to_str(message, idx, tag, self._padding))
+    def _format(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        return message_to_str(message, idx, tag, self._padding)
+
+    @override
+    def _format_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        return ""
+
+    @override
+    def _write(self, text: str) -> None:
+        self._func(text)
+
+    @override
+    def _flush(self) -> None:
+        pass
 
 class FileLogger(PrintLogger):
     @override
@@ -62,10 +131,15 @@ class FileLogger(PrintLogger):
         return self._file_path
 
     @override
-    def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+    def _write(self, text: str) -> None:
         if self._file is None:
             self._file = self._file_path.open("a", encoding="utf-8")
-        print(message_to_str(message, idx, tag, self._padding), end="\n\n", file=self._file, flush=True)
+        self._file.write(text)
+
+    @override
+    def _flush(self) -> None:
+        if self._file is not None:
+            self._file.flush()
 
     @override
     def close(self) -> None:
@@ -73,6 +147,112 @@ class FileLogger(PrintLogger):
             self._file.close()
             self._file = None
 
+class JSONLogger(FileLogger):
+    @override
+    def __init__(self, file_path: str | Path):
+        super().__init__(file_path)
+        self._starts: dict[tuple[Optional[int], Optional[str]], Optional[float]] = {}
+
+    @override
+    def _format(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        start = self._starts.pop((idx, tag), timestamp)
+        return message_to_json(message, idx, tag, timestamp, start) + "\n"
+
+    @override
+    def _format_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        self._starts.setdefault((idx, tag), timestamp)
+        return ""
+
+    @override
+    def _format_end(self, idx: Optional[int] = None, tag: Optional[str] = None, timestamp: Optional[float] = None) -> str:
+        self._starts.pop((idx, tag), None)
+        return ""
+
+class BackgroundLogger(Logger):
+    _close = object()
+
+    @override
+    def __init__(self, logger: PrintLogger, flush_interval: float = 1, batch_size: int = 1024, max_queue: int = 65536, block: bool = True):
+        super().__init__()
+        self._logger = logger
+        self._flush_interval = flush_interval
+        self._batch_size = batch_size
+        self._max_queue = max_queue
+        self._block = block
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+        self._queue: queue.Queue[Any] = queue.Queue(max_queue)
+        self._thread: Optional[threading.Thread] = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def get_logger(self) -> PrintLogger:
+        return self._logger
+
+    def get_dropped(self) -> int:
+        return self._dropped
+
+    def _put(self, record: tuple[Literal["message", "chunk", "end"], Optional[Message], Optional[int], Optional[str], float]) -> None:
+        if self._block:
+            self._queue.put(record)
+            return
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self._dropped += 1
+
+    @override
+    def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        self._put(("message", message, idx, tag, time.time()))
+
+    @override
+    def _log_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        self._put(("chunk", chunk, idx, tag, time.time()))
+
+    @override
+    def _end_stream(self, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        self._put(("end", None, idx, tag, time.time()))
+
+    def _run(self) -> None:
+        pending = 0
+        flushed = time.monotonic()
+        while True:
+            timeout = None if pending == 0 else max(0, flushed + self._flush_interval - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+            if record is not None and record is not BackgroundLogger._close:
+                kind, message, idx, tag, timestamp = record
+                if kind == "end":
+                    text = self._logger._format_end(idx, tag, timestamp)
+                elif message is None or not self._logger.get_verbose():
+                    text = ""
+                elif kind == "chunk":
+                    text = self._logger._format_chunk(message, idx, tag, timestamp)
+                else:
+                    text = self._logger._format(message, idx, tag, timestamp)
+                if text != "":
+                    if text != "":
+                        self._logger._write(text)
+                        pending += 1
+            if pending > 0 and (record is None or record is BackgroundLogger._close or pending >= self._batch_size or time.monotonic() - flushed >= self._flush_interval):
+                self._logger._flush()
+                pending = 0
+                flushed = time.monotonic()
+            if record is BackgroundLogger._close:
+                return
+
+    @override
+    def close(self) -> None:
+        if self._thread is not None:
+            atexit.unregister(self.close)
+            self._queue.put(BackgroundLogger._close)
+            self._thread.join()
+            self._thread = None
+            self._logger.close()
+
 class MultiLogger(Logger):
     @override
     def __init__(self, *loggers: Logger):
@@ -90,6 +270,16 @@ class MultiLogger(Logger):
         for logger in self._loggers:
             logger.log(message, idx, tag)
 
+    @override
+    def _log_chunk(self, chunk: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        for logger in self._loggers:
+            logger.log_chunk(chunk, idx, tag)
+
+    @override
+    def _end_stream(self, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        for logger in self._loggers:
+            logger.end_stream(idx, tag)
+
     @override
     def close(self) -> None:
         for logger in self._loggers:
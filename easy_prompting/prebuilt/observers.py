@@ -0,0 +1,183 @@
+import re
+import json
+import math
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Callable, Optional, override
+
+from easy_prompting.observer import Report, Observer
+from easy_prompting.utils import create_dir, save_text
+
+def group_tag(tag: Optional[str]) -> Optional[str]:
+    if tag is None or re.fullmatch(r"\d+", tag):
+        return None
+    return re.sub(r"(/\d+)+$", "", tag)
+
+def percentiles(values: list[float], *ps: float) -> dict[str, Optional[float]]:
+    values = sorted(values)
+    return {
+        f"p{p:g}": values[max(0, math.ceil(p / 100 * len(values)) - 1)] if len(values) > 0 else None
+        for p in ps
+    }
+
+class _Metrics:
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.hits = 0
+        self.misses = 0
+        self.prompt_chars = 0
+        self.completion_chars = 0
+        self.start: Optional[float] = None
+        self.end: Optional[float] = None
+        self.durations: deque[float] = deque(maxlen=max_samples)
+        self.ttfts: deque[float] = deque(maxlen=max_samples)
+        self.spans: dict[str, deque[float]] = {}
+        self.totals: dict[str, float] = {}
+        self._max_samples = max_samples
+
+    def add(self, report: Report) -> None:
+        self.calls += 1
+        self.errors += report.error is not None
+        self.hits += report.cache_hit is True
+        self.misses += report.cache_hit is False
+        self.prompt_chars += report.prompt_chars
+        self.completion_chars += report.completion_chars
+        self.start = report.time if self.start is None else min(self.start, report.time)
+        self.end = report.time + report.duration if self.end is None else max(self.end, report.time + report.duration)
+        self.durations.append(report.duration)
+        if report.ttft is not None:
+            self.ttfts.append(report.ttft)
+        spans: dict[str, float] = {}
+        for span in report.spans:
+            spans[span.name] = spans.get(span.name, 0) + span.duration
+        for name, duration in spans.items():
+            self.spans.setdefault(name, deque(maxlen=self._max_samples)).append(duration)
+            self.totals[name] = self.totals.get(name, 0) + duration
+
+    def to_dict(self) -> dict[str, Any]:
+        elapsed = 0 if self.start is None or self.end is None else self.end - self.start
+        return dict(
+            calls=self.calls,
+            errors=self.errors,
+            cache_hits=self.hits,
+            cache_misses=self.misses,
+            hit_ratio=self.hits / (self.hits + self.misses) if self.hits + self.misses > 0 else None,
+            calls_per_second=self.calls / elapsed if elapsed > 0 else None,
+            completion_chars_per_second=self.completion_chars / elapsed if elapsed > 0 else None,
+            prompt_chars=self.prompt_chars,
+            completion_chars=self.completion_chars,
+            latency=percentiles(list(self.durations), 50, 90, 95, 99, 100),
+            ttft=percentiles(list(self.ttfts), 50, 90, 95, 99, 100),
+            spans={
+                name: percentiles(list(durations), 50, 90, 95, 99, 100) | dict(total=self.totals[name])
+                for name, durations in self.spans.items()
+            }
+        )
+
+class MetricsObserver(Observer):
+    @override
+    def __init__(self, file_path: Optional[str | Path] = None, group: Callable[[Optional[str]], Optional[str]] = group_tag, max_samples: int = 10000):
+        self._mutex = threading.Lock()
+        self.set_file_path(file_path)
+        self.set_group(group)
+        self.set_max_samples(max_samples)
+        self.reset()
+
+    def set_file_path(self, file_path: Optional[str | Path] = None) -> None:
+        self._file_path = None if file_path is None else Path(file_path)
+
+    def get_file_path(self) -> Optional[Path]:
+        return self._file_path
+
+    def set_group(self, group: Callable[[Optional[str]], Optional[str]] = group_tag) -> None:
+        self._group = group
+
+    def get_group(self) -> Callable[[Optional[str]], Optional[str]]:
+        return self._group
+
+    def set_max_samples(self, max_samples: int = 10000) -> None:
+        self._max_samples = max_samples
+
+    def get_max_samples(self) -> int:
+        return self._max_samples
+
+    def reset(self) -> None:
+        with self._mutex:
+            self._metrics: dict[Optional[str], _Metrics] = {}
+
+    @override
+    def observe(self, report: Report) -> None:
+        group = self._group(report.tag)
+        with self._mutex:
+            metrics = self._metrics.get(group)
+            if metrics is None:
+                metrics = self._metrics[group] = _Metrics(self._max_samples)
+            metrics.add(report)
+
+    def get_metrics(self) -> dict[Optional[str], dict[str, Any]]:
+        with self._mutex:
+            return {group: metrics.to_dict() for group, metrics in self._metrics.items()}
+
+    def save(self, file_path: Optional[str | Path] = None) -> None:
+        file_path = self._file_path if file_path is None else Path(file_path)
+        if file_path is None:
+            raise ValueError("No file path has been given for the metrics")
+        save_text(file_path, json.dumps([dict(tag=tag) | metrics for tag, metrics in self.get_metrics().items()], indent=2))
+
+    @override
+    def close(self) -> None:
+        if self._file_path is not None:
+            self.save()
+
+class FileObserver(Observer):
+    @override
+    def __init__(self, file_path: str | Path):
+        self._mutex = threading.Lock()
+        self._file = None
+        self.set_file_path(file_path)
+
+    def set_file_path(self, file_path: str | Path) -> None:
+        self._file_path = Path(file_path)
+        create_dir(self._file_path.parent)
+
+    def get_file_path(self) -> Path:
+        return self._file_path
+
+    @override
+    def observe(self, report: Report) -> None:
+        line = json.dumps(report.to_dict(), ensure_ascii=False) + "\n"
+        with self._mutex:
+            if self._file is None:
+                self._file = self._file_path.open("a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+
+    @override
+    def close(self) -> None:
+        with self._mutex:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+class MultiObserver(Observer):
+    @override
+    def __init__(self, *observers: Observer):
+        self.set_observers(*observers)
+
+    def set_observers(self, *observers: Observer) -> None:
+        self._observers = list(observers)
+
+    def get_observers(self) -> list[Observer]:
+        return self._observers
+
+    @override
+    def observe(self, report: Report) -> None:
+        for observer in self._observers:
+            observer.observe(report)
+
+    @override
+    def close(self) -> None:
+        for observer in self._observers:
+            observer.close()
\ No newline at end of file
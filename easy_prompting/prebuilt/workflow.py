@@ -0,0 +1,193 @@
+import json
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional, Sequence
+
+from easy_prompting.message import Role, Message
+from easy_prompting.instruction import Instruction
+from easy_prompting.prompter import _BufferLogger, Prompter
+from easy_prompting.utils import create_dir, hash_str, chain_hash, truncate_line
+
+def _to_json(data: Any) -> Any:
+    if isinstance(data, tuple):
+        return {"__tuple__": [_to_json(item) for item in data]}
+    if isinstance(data, list):
+        return [_to_json(item) for item in data]
+    if isinstance(data, dict):
+        return {key: _to_json(value) for key, value in data.items()}
+    return data
+
+def _from_json(data: Any) -> Any:
+    if isinstance(data, dict):
+        if list(data) == ["__tuple__"]:
+            return tuple(_from_json(item) for item in data["__tuple__"])
+        return {key: _from_json(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_from_json(item) for item in data]
+    return data
+
+class Step:
+    def __init__(self, name: str, instruction: Instruction, depends: Sequence[str] = (), message: Optional[Callable[[dict[str, Any]], str]] = None, prompter: Optional[Prompter] = None, role: Role = "user", stop: Optional[str] = None):
+        self._name = name
+        self._instruction = instruction
+        self._depends = tuple(depends)
+        self._message = message
+        self._prompter = prompter
+        self._role: Role = role
+        self._stop = stop
+
+    def get_name(self) -> str:
+        return self._name
+
+    def get_depends(self) -> tuple[str, ...]:
+        return self._depends
+
+class Workflow:
+    def __init__(self, prompter: Prompter, checkpoint: Optional[str | Path] = None, max_workers: int = 8):
+        self._steps: dict[str, Step] = {}
+        self._prompters: dict[str, Prompter] = {}
+        self.set_prompter(prompter)
+        self.set_checkpoint(checkpoint)
+        self.set_max_workers(max_workers)
+
+    def set_prompter(self, prompter: Prompter) -> None:
+        self._prompter = prompter
+
+    def get_prompter(self, name: Optional[str] = None) -> Prompter:
+        if name is None:
+            return self._prompter
+        return self._prompters[name]
+
+    def set_checkpoint(self, checkpoint: Optional[str | Path] = None) -> None:
+        self._checkpoint = None if checkpoint is None else Path(checkpoint)
+
+    def get_checkpoint(self) -> Optional[Path]:
+        return self._checkpoint
+
+    def set_max_workers(self, max_workers: int = 8) -> None:
+        self._max_workers = max_workers
+
+    def get_max_workers(self) -> int:
+        return self._max_workers
+
+    def add_step(self, name: str, instruction: Instruction, depends: Sequence[str] = (), message: Optional[Callable[[dict[str, Any]], str]] = None, prompter: Optional[Prompter] = None, role: Role = "user", stop: Optional[str] = None) -> Step:
+        if name in self._steps:
+            raise ValueError(f"The workflow already has a step {name!r}")
+        step = self._steps[name] = Step(name, instruction, depends, message, prompter, role, stop)
+        return step
+
+    def get_steps(self) -> list[Step]:
+        return list(self._steps.values())
+
+    def _check(self) -> None:
+        for step in self._steps.values():
+            for name in step._depends:
+                if name not in self._steps:
+                    raise ValueError(f"The step {step._name!r} depends on the unknown step {name!r}")
+        visited: set[str] = set()
+        for step in self._steps.values():
+            path: set[str] = set()
+            stack = [(step._name, False)]
+            while len(stack) > 0:
+                name, leave = stack.pop()
+                if leave:
+                    path.discard(name)
+                    visited.add(name)
+                    continue
+                if name in path:
+                    raise ValueError(f"The workflow has a cycle through the step {name!r}")
+                if name in visited:
+                    continue
+                path.add(name)
+                stack.append((name, True))
+                stack.extend((depend, False) for depend in self._steps[name]._depends)
+
+    def load_checkpoint(self) -> dict[str, tuple[Any, str]]:
+        results: dict[str, tuple[Any, str]] = {}
+        if self._checkpoint is None or not self._checkpoint.exists():
+            return results
+        with self._checkpoint.open(encoding="utf-8") as file:
+            for line in file:
+                if line.strip() == "":
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                results[record["key"]] = (_from_json(record["data"]), record["completion"])
+        return results
+
+    def _save_checkpoint(self, step: Step, key: str, data: Any, completion: str) -> None:
+        if self._checkpoint is None:
+            return
+        try:
+            line = json.dumps(dict(step=step._name, key=key, data=_to_json(data), completion=completion), ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            raise TypeError(f"The result of the step {step._name!r} can not be saved into the checkpoint \"{self._checkpoint}\": {e}") from e
+        create_dir(self._checkpoint.parent)
+        with self._checkpoint.open("a", encoding="utf-8") as file:
+            file.write(line + "\n")
+
+    def run(self) -> dict[str, Any]:
+        self._check()
+        if self._checkpoint is not None:
+            truncate_line(self._checkpoint)
+        checkpoint = self.load_checkpoint()
+        results: dict[str, Any] = {}
+        lock = threading.Lock()
+
+        def run(step: Step) -> Any:
+            prompter = (self._prompter if step._prompter is None else step._prompter).get_copy()
+            tag = self._prompter.get_tag()
+            prompter.set_tag(step._name if tag is None else f"{tag}/{step._name}")
+            inputs = {name: results[name] for name in step._depends}
+            self._prompters[step._name] = prompter
+            message = None if step._message is None else step._message(inputs)
+            history = prompter.get_history()
+            if message is not None:
+                history = history.add(Message(message, step._role))
+            history = history.add(step._instruction.get_message(step._role))
+            key = chain_hash(history.get_digest(), hash_str(json.dumps(_to_json(inputs), sort_keys=True, default=repr)))
+            if key in checkpoint:
+                data, completion = checkpoint[key]
+                prompter.set_history(history.add(Message(completion, "assistant")))
+                return data
+            logger = prompter.get_logger()
+            buffer = None if logger is None else _BufferLogger()
+            prompter.set_logger(buffer)
+            try:
+                if message is not None:
+                    prompter.add_message(message, step._role)
+                data = prompter.get_data(step._instruction, step._stop, step._role)
+            finally:
+                if buffer is not None and logger is not None:
+                    with lock:
+                        buffer.flush(logger)
+                prompter.set_logger(logger)
+            with lock:
+                self._save_checkpoint(step, key, data, prompter.get_last_message().get_content())
+            return data
+
+        from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, Future, wait
+        pending = list(self._steps.values())
+        running: dict[Future[Any], Step] = {}
+        error: Optional[BaseException] = None
+        with ThreadPoolExecutor(self._max_workers) as executor:
+            while len(pending) > 0 or len(running) > 0:
+                if error is None:
+                    for step in [step for step in pending if all(name in results for name in step._depends)]:
+                        pending.remove(step)
+                        running[executor.submit(run, step)] = step
+                if len(running) == 0:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step = running.pop(future)
+                    try:
+                        results[step._name] = future.result()
+                    except BaseException as e:
+                        if error is None:
+                            error = e
+        if error is not None:
+            raise error
+        return {name: results[name] for name in self._steps}
\ No newline at end of file
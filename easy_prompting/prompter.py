@@ -1,12 +1,59 @@
+import time
+import json
+import threading
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Any, Optional
+from typing import Any, ContextManager, Iterable, Iterator, Literal, Optional, override
 
-from easy_prompting.instruction import Instruction
+from easy_prompting.instruction import ExtractionError, Parser, Instruction
 from easy_prompting.debugger import Debugger
-from easy_prompting.utils import load_text, save_text, hash_str, wrap_text
+from easy_prompting.cache import Cache, DirCache
+from easy_prompting.batch import Batch
+from easy_prompting.snapshot import Snapshot
+from easy_prompting.utils import hash_str, chain_hash, wrap_text
 from easy_prompting.message import Role, Message
-from easy_prompting.lm import LM
+from easy_prompting.history import History
+from easy_prompting.lm import LMError, PendingError, LM, AsyncLM, ExecutorLM
 from easy_prompting.logger import Logger
+from easy_prompting.context import ContextPolicy
+from easy_prompting.observer import Report, Observer
+
+class _BufferLogger(Logger):
+    def __init__(self):
+        super().__init__()
+        self._records: list[tuple[Message, Optional[int], Optional[str]]] = []
+
+    def flush(self, logger: Logger) -> None:
+        for message, idx, tag in self._records:
+            logger.log(message, idx, tag)
+        self._records.clear()
+
+    @override
+    def _log(self, message: Message, idx: Optional[int] = None, tag: Optional[str] = None) -> None:
+        self._records.append((message, idx, tag))
+
+    @override
+    def close(self) -> None:
+        pass
+
+_lock_executor: Any = None
+_lock_executor_lock = threading.Lock()
+
+async def _enter_async(lock: ContextManager[Any]) -> None:
+    global _lock_executor
+    if isinstance(lock, nullcontext):
+        return
+    import asyncio
+    from concurrent.futures import ThreadPoolExecutor
+    with _lock_executor_lock:
+        if _lock_executor is None:
+            _lock_executor = ThreadPoolExecutor(32, "easy_prompting_lock")
+    future = asyncio.get_running_loop().run_in_executor(_lock_executor, lock.__enter__)
+    try:
+        await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(lambda future: future.cancelled() or future.exception() is not None or lock.__exit__(None, None, None))
+        raise
 
 class Prompter:
     def __init__(self, lm: LM):
@@ -16,6 +63,12 @@ class Prompter:
         self.set_debugger()
         self.set_cache()
         self.set_tag()
+        self.set_policy()
+        self.set_observer()
+        self.set_batch()
+        self.set_snapshot()
+        self._report: Optional[Report] = None
+        self._ttft: Optional[float] = None
 
     def set_lm(self, lm: LM) -> None:
         self._lm = lm
@@ -30,16 +83,35 @@ class Prompter:
         return self._tag
     
     def set_messages(self, messages: list[Message]) -> None:
-        self._messages = messages
+        self.set_history(History.from_messages(messages))
     
     def get_messages(self) -> list[Message]:
-        return self._messages
+        return self._history.get_messages()
+
+    def get_last_message(self) -> Message:
+        message = self._history.get_message()
+        if message is None:
+            raise IndexError("The conversation has no messages")
+        return message
+
+    def set_history(self, history: History) -> None:
+        self._history = history
+
+    def get_history(self) -> History:
+        return self._history
+
+    def get_digest(self) -> str:
+        return self._history.get_digest()
     
-    def set_cache(self, cache_path: Optional[str | Path] = None) -> None:
-        self._cache_path = None if cache_path is None else Path(cache_path)
+    def set_cache(self, cache: Optional[str | Path | Cache] = None, legacy: bool = False) -> None:
+        self._cache = DirCache(cache) if isinstance(cache, (str, Path)) else cache
+        self._legacy = legacy
         
-    def get_cache(self) -> Optional[Path]:
-        return self._cache_path
+    def get_cache(self) -> Optional[Cache]:
+        return self._cache
+
+    def get_legacy(self) -> bool:
+        return self._legacy
 
     def set_logger(self, logger: Optional[Logger] = None) -> None:
         self._logger = logger
@@ -52,39 +124,334 @@ class Prompter:
 
     def get_debugger(self) -> Optional[Debugger]:
         return self._debugger
+
+    def set_policy(self, policy: Optional[ContextPolicy] = None) -> None:
+        self._policy = policy
+
+    def get_policy(self) -> Optional[ContextPolicy]:
+        return self._policy
+
+    def set_observer(self, observer: Optional[Observer] = None) -> None:
+        self._observer = observer
+
+    def get_observer(self) -> Optional[Observer]:
+        return self._observer
+
+    def set_batch(self, batch: Optional[str | Path | Batch] = None) -> None:
+        self._batch = Batch(batch) if isinstance(batch, (str, Path)) else batch
+
+    def get_batch(self) -> Optional[Batch]:
+        return self._batch
+
+    def set_snapshot(self, snapshot: Optional[str | Path | Snapshot] = None) -> None:
+        self._snapshot = Snapshot(snapshot) if isinstance(snapshot, (str, Path)) else snapshot
+        if self._snapshot is not None:
+            self._snapshot.save(self._history, self._tag)
+
+    def get_snapshot(self) -> Optional[Snapshot]:
+        return self._snapshot
+
+    def load_snapshot(self, snapshot: str | Path | Snapshot, tag: Optional[str] = None, digest: Optional[str] = None) -> None:
+        snapshot = Snapshot(snapshot) if isinstance(snapshot, (str, Path)) else snapshot
+        history, tag = snapshot.load(tag, digest)
+        self.set_history(history)
+        self.set_tag(tag)
+        self.set_snapshot(snapshot)
+
+    def get_context(self) -> list[Message]:
+        messages = self.get_messages()
+        if self._policy is None:
+            return messages
+        return self._policy.apply(messages)
     
     def get_copy(self) -> "Prompter":
         prompter = Prompter(self.get_lm())
-        prompter.set_messages(self.get_messages().copy())
+        prompter.set_history(self.get_history())
         prompter.set_logger(self.get_logger())
         prompter.set_debugger(self.get_debugger())
-        prompter.set_cache(self.get_cache())
+        prompter.set_cache(self.get_cache(), self.get_legacy())
+        prompter.set_policy(self.get_policy())
+        prompter.set_observer(self.get_observer())
+        prompter.set_batch(self.get_batch())
+        prompter.set_snapshot(self.get_snapshot())
         prompter.set_tag()
         return prompter
 
     def add_message(self, content: str, role: Role = "user") -> None:
-        message = Message(content, role)
-        self._messages.append(message)
+        self._add_message(Message(content, role))
+
+    def _add_message(self, message: Message) -> None:
+        self._history = self._history.add(message)
+        if self._snapshot is not None:
+            self._snapshot.save(self._history, self._tag)
         if self._logger is not None:
-            self._logger.log(message, len(self._messages)-1, self._tag)
-
-    def add_completion(self, stop: Optional[str] = None) -> None:
-        if self._debugger is not None:
-            self._debugger.debug(self)
-        if self._cache_path is None:
-            completion = self._lm.get_completion(self._messages, stop)
-        else:
-            file_path = self._cache_path / hash_str("\n\n".join(repr(message) for message in self._messages))
-            completion = load_text(file_path)
-            if completion is None:
-                completion = self._lm.get_completion(self._messages, stop)
-                save_text(file_path, completion)
+            with self._span("log"):
+                self._logger.log(message, len(self._history)-1, self._tag)
+
+    @contextmanager
+    def _observe(self, kind: Literal["completion", "data"]) -> Iterator[Optional[Report]]:
+        if self._observer is None or self._report is not None:
+            yield self._report
+            return
+        report = self._report = Report(self._tag, kind, time.time())
+        start = time.perf_counter()
+        try:
+            yield report
+        except BaseException as e:
+            report.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            report.duration = time.perf_counter() - start
+            self._report = None
+            self._observer.observe(report)
+
+    def _span(self, name: str) -> ContextManager[Any]:
+        if self._report is None:
+            return nullcontext()
+        return self._report.span(name)
+
+    def _finish_report(self, report: Optional[Report], key: str, hit: bool, completion: str, context: Optional[list[Message]]) -> None:
+        if report is not None:
+            report.key = key
+            report.cache_hit = None if self._cache is None else hit
+            report.completion_chars = len(completion)
+            report.set_prompt(self.get_context() if context is None else context)
+
+    def get_key(self, stop: Optional[str] = None) -> str:
+        return self._history.get_key(self._lm.get_fingerprint(), stop)
+
+    def get_pool_key(self, stop: Optional[str] = None) -> str:
+        return chain_hash(self.get_key(stop), "samples")
+
+    def _load_cache(self, key: str, peek: bool = False) -> Optional[str]:
+        if self._cache is None:
+            return None
+        namespace = self._lm.get_namespace()
+        completion = (self._cache.peek if peek else self._cache.load)(key, namespace)
+        if completion is None and self._legacy:
+            legacy_key = hash_str("\n\n".join(repr(message) for message in self.get_messages()))
+            completion = self._cache.peek(legacy_key, namespace)
+            if completion is None and namespace is not None:
+                completion = self._cache.peek(legacy_key)
+            if completion is not None:
+                self._cache.save(key, completion, namespace)
+        return completion
+
+    def _lock_cache(self, key: str) -> ContextManager[Any]:
+        if self._cache is None:
+            return nullcontext()
+        return self._cache.lock(key, self._lm.get_namespace())
+
+    def _save_cache(self, key: str, completion: str) -> None:
+        if self._cache is not None:
+            self._cache.save(key, completion, self._lm.get_namespace())
+
+    def _load_pool(self, key: str, peek: bool = False) -> list[str]:
+        if self._cache is None:
+            return []
+        text = (self._cache.peek if peek else self._cache.load)(key, self._lm.get_namespace())
+        return [] if text is None else json.loads(text)
+
+    def _defer(self, key: str, context: list[Message], stop: Optional[str] = None) -> None:
+        if self._batch is not None:
+            namespace = self._lm.get_namespace()
+            self._batch.add(key, self._lm.get_request(context, stop), namespace)
+            raise PendingError(f"The completion has been added to the batch \"{self._batch.get_file_path()}\"", key, namespace)
+
+    def _add_completion(self, completion: str, stop: Optional[str] = None) -> None:
         if stop is not None:
             completion += stop
         self.add_message(completion, "assistant")
 
-    def get_data(self, instruction: Instruction, stop: Optional[str] = None, role: Role = "user") -> Any:
-        self.add_message(instruction.describe(), role)
-        self.add_completion(stop)
-        completion = self._messages[-1].get_content()
-        return instruction.extract(completion)
\ No newline at end of file
+    def get_ttft(self) -> Optional[float]:
+        return self._ttft
+
+    def _stream_completion(self, stop: Optional[str] = None, parser: Optional[Parser] = None, context: Optional[list[Message]] = None) -> str:
+        start = time.perf_counter()
+        chunks: list[str] = []
+        stream = self._lm.stream_completion(self.get_context() if context is None else context, stop)
+        try:
+            for chunk in stream:
+                if len(chunks) == 0:
+                    self._ttft = time.perf_counter() - start
+                chunks.append(chunk)
+                if self._logger is not None:
+                    self._logger.log_chunk(Message(chunk, "assistant"), len(self._history), self._tag)
+                if parser is not None:
+                    parser.feed(chunk)
+                    if parser.is_done():
+                        break
+        finally:
+            close = getattr(stream, "close", None)
+            if close is not None:
+                close()
+        if stop is not None:
+            if self._logger is not None:
+                self._logger.log_chunk(Message(stop, "assistant"), len(self._history), self._tag)
+            if parser is not None:
+                parser.feed(stop)
+        return "".join(chunks)
+
+    def add_completion(self, stop: Optional[str] = None, stream: bool = False) -> None:
+        self._add_completion_until(stop, stream)
+
+    def _add_completion_until(self, stop: Optional[str] = None, stream: bool = False, parser: Optional[Parser] = None) -> bool:
+        with self._observe("completion") as report:
+            if self._debugger is not None:
+                with self._span("debug"):
+                    self._debugger.debug(self)
+            self._ttft = None
+            key = self.get_key(stop)
+            context = None
+            streamed = False
+            with self._span("cache_load"):
+                completion = self._load_cache(key)
+            if completion is None:
+                lock = self._lock_cache(key)
+                with self._span("lock"):
+                    lock.__enter__()
+                try:
+                    with self._span("cache_load"):
+                        completion = self._load_cache(key, True)
+                    if completion is None:
+                        context = self.get_context()
+                        self._defer(key, context, stop)
+                        with self._span("lm"):
+                            if stream:
+                                completion = self._stream_completion(stop, parser, context)
+                                streamed = True
+                                if report is not None:
+                                    report.ttft = self._ttft
+                            else:
+                                completion = self._lm.get_completion(context, stop)
+                        with self._span("cache_save"):
+                            self._save_cache(key, completion)
+                except BaseException:
+                    if stream and self._logger is not None:
+                        self._logger.end_stream(len(self._history), self._tag)
+                    raise
+                finally:
+                    lock.__exit__(None, None, None)
+            self._finish_report(report, key, context is None, completion, context)
+            self._add_completion(completion, stop)
+            return streamed
+
+    async def add_completion_async(self, stop: Optional[str] = None) -> None:
+        with self._observe("completion") as report:
+            if self._debugger is not None:
+                with self._span("debug"):
+                    self._debugger.debug(self)
+            self._ttft = None
+            key = self.get_key(stop)
+            context = None
+            with self._span("cache_load"):
+                completion = self._load_cache(key)
+            if completion is None:
+                lock = self._lock_cache(key)
+                with self._span("lock"):
+                    await _enter_async(lock)
+                try:
+                    with self._span("cache_load"):
+                        completion = self._load_cache(key, True)
+                    if completion is None:
+                        context = self.get_context()
+                        self._defer(key, context, stop)
+                        lm = self._lm if isinstance(self._lm, AsyncLM) else ExecutorLM(self._lm)
+                        with self._span("lm"):
+                            completion = await lm.get_completion_async(context, stop)
+                        with self._span("cache_save"):
+                            self._save_cache(key, completion)
+                finally:
+                    lock.__exit__(None, None, None)
+            self._finish_report(report, key, context is None, completion, context)
+            self._add_completion(completion, stop)
+
+    def get_completions(self, n: int, stop: Optional[str] = None) -> list[str]:
+        with self._observe("completion") as report:
+            if self._debugger is not None:
+                with self._span("debug"):
+                    self._debugger.debug(self)
+            self._ttft = None
+            key = self.get_pool_key(stop)
+            context = None
+            with self._span("cache_load"):
+                samples = self._load_pool(key)
+            if len(samples) < n:
+                lock = self._lock_cache(key)
+                with self._span("lock"):
+                    lock.__enter__()
+                try:
+                    with self._span("cache_load"):
+                        samples = self._load_pool(key, True)
+                    if len(samples) < n:
+                        context = self.get_context()
+                        with self._span("lm"):
+                            samples += self._lm.get_completions(context, n - len(samples), stop)
+                        with self._span("cache_save"):
+                            self._save_cache(key, json.dumps(samples, ensure_ascii=False))
+                finally:
+                    lock.__exit__(None, None, None)
+            samples = samples[:n]
+            self._finish_report(report, key, context is None, "".join(samples), context)
+            return samples
+
+    def get_data(self, instruction: Instruction, stop: Optional[str] = None, role: Role = "user", stream: bool = False) -> Any:
+        with self._observe("data"):
+            self._add_message(instruction.get_message(role))
+            parser = instruction.get_parser() if stream else None
+            streamed = self._add_completion_until(stop, stream, parser)
+            completion = self.get_last_message().get_content()
+            with self._span("extract"):
+                if parser is None:
+                    return instruction.extract(completion)
+                if not streamed:
+                    parser.feed(completion)
+                return parser.close()
+
+    async def get_data_async(self, instruction: Instruction, stop: Optional[str] = None, role: Role = "user") -> Any:
+        with self._observe("data"):
+            self._add_message(instruction.get_message(role))
+            await self.add_completion_async(stop)
+            completion = self.get_last_message().get_content()
+            with self._span("extract"):
+                return instruction.extract(completion)
+
+    def get_data_samples(self, instruction: Instruction, n: int, stop: Optional[str] = None, role: Role = "user") -> list[Any]:
+        with self._observe("data"):
+            history = self._history
+            self._history = history.add(instruction.get_message(role))
+            try:
+                completions = self.get_completions(n, stop)
+            finally:
+                self._history = history
+            data = []
+            with self._span("extract"):
+                for completion in completions:
+                    try:
+                        data.append(instruction.extract(completion if stop is None else completion + stop))
+                    except ExtractionError as e:
+                        data.append(e)
+            return data
+
+    def map(self, inputs: Iterable[str], instruction: Instruction, stop: Optional[str] = None, role: Role = "user", max_workers: int = 8) -> list[Any]:
+        lock = threading.Lock()
+
+        def run(i: int, content: str) -> Any:
+            prompter = self.get_copy()
+            prompter.set_tag(str(i) if self._tag is None else f"{self._tag}/{i}")
+            buffer = None if self._logger is None else _BufferLogger()
+            prompter.set_logger(buffer)
+            try:
+                prompter.add_message(content, role)
+                return prompter.get_data(instruction, stop, role)
+            except (ExtractionError, LMError) as e:
+                return e
+            finally:
+                if buffer is not None and self._logger is not None:
+                    with lock:
+                        buffer.flush(self._logger)
+
+        from concurrent.futures import ThreadPoolExecutor
+        contents = list(inputs)
+        with ThreadPoolExecutor(max_workers) as executor:
+            return list(executor.map(run, range(len(contents)), contents))
\ No newline at end of file
@@ -0,0 +1,109 @@
+import re
+import json
+import mmap
+import threading
+from pathlib import Path
+from typing import Optional
+
+from easy_prompting.message import Role, Message
+from easy_prompting.history import History
+from easy_prompting.utils import create_dir, truncate_line
+
+_line = re.compile(rb'^\{"digest": "([0-9a-f]+)", "parent": "([0-9a-f]*)", "role": "(\w+)", [^\n]*\n', re.MULTILINE)
+
+class Snapshot:
+    def __init__(self, file_path: str | Path):
+        self._mutex = threading.Lock()
+        self.set_file_path(file_path)
+
+    def set_file_path(self, file_path: str | Path) -> None:
+        self._file_path = Path(file_path)
+        self._saved: Optional[set[str]] = None
+        self._repaired = False
+
+    def get_file_path(self) -> Path:
+        return self._file_path
+
+    def _scan(self, data: bytes | mmap.mmap) -> list[tuple[str, str, Role, int, int]]:
+        return [
+            (match[1].decode(), match[2].decode(), match[3].decode(), match.start(), match.end() - 1)  # type: ignore
+            for match in _line.finditer(data)
+        ]
+
+    def _get_saved(self) -> set[str]:
+        if self._saved is None:
+            self._saved = set()
+            if self._file_path.is_file() and self._file_path.stat().st_size > 0:
+                with self._file_path.open("rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                    self._saved.update(digest for digest, _, _, _, _ in self._scan(data))
+        return self._saved
+
+    def _repair(self) -> None:
+        if not self._repaired:
+            self._repaired = True
+            truncate_line(self._file_path)
+
+    def save(self, history: History, tag: Optional[str] = None) -> int:
+        with self._mutex:
+            saved = self._get_saved()
+            new: list[History] = []
+            node: Optional[History] = history
+            while node is not None and len(node) > 0 and node.get_digest() not in saved:
+                new.append(node)
+                node = node.get_parent()
+            if len(new) == 0:
+                return 0
+            lines = []
+            for node in reversed(new):
+                parent = node.get_parent()
+                message = node.get_message()
+                assert parent is not None and message is not None
+                record = dict(digest=node.get_digest(), parent=parent.get_digest(), role=message.get_role(), tag=tag, content=message.get_content())
+                lines.append(json.dumps(record, ensure_ascii=False) + "\n")
+            create_dir(self._file_path.parent)
+            self._repair()
+            with self._file_path.open("a", encoding="utf-8") as file:
+                file.write("".join(lines))
+            saved.update(node.get_digest() for node in new)
+            return len(lines)
+
+    def load(self, tag: Optional[str] = None, digest: Optional[str] = None) -> tuple[History, Optional[str]]:
+        if not self._file_path.is_file() or self._file_path.stat().st_size == 0:
+            return History(), tag
+        with self._file_path.open("rb") as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        def read(start: int, end: int) -> dict:
+            return json.loads(data[start:end])
+
+        def load(role: Role, start: int, end: int) -> Message:
+            return Message(read(start, end)["content"], role)
+
+        lines = self._scan(data)
+        head = None
+        for i in reversed(range(len(lines))):
+            if digest is not None:
+                if lines[i][0] == digest:
+                    head = i
+                    break
+            elif tag is None or read(*lines[i][3:])["tag"] == tag:
+                head = i
+                break
+        if head is None:
+            if digest is not None:
+                raise ValueError(f"The snapshot \"{self._file_path}\" has no conversation {digest}")
+            return History(), tag
+        index = {line[0]: line for line in lines[:head + 1]}
+        path = []
+        node_digest = lines[head][0]
+        while node_digest != "":
+            if node_digest not in index:
+                raise ValueError(f"The snapshot \"{self._file_path}\" is missing the conversation {node_digest}")
+            path.append(index[node_digest])
+            node_digest = index[node_digest][1]
+        history = History()
+        for line_digest, _, role, start, end in reversed(path):
+            history = History.from_digest(history, line_digest, lambda role=role, start=start, end=end: load(role, start, end))
+        with self._mutex:
+            self._saved = set(line[0] for line in lines)
+        return history, read(*lines[head][3:])["tag"]
\ No newline at end of file
@@ -1,7 +1,14 @@
+import os
+import time
+import zlib
 import shutil
 import hashlib
+import uuid
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Optional
+from typing import Any, Iterator, Literal, Optional
+
+Compression = Literal["zlib", "zstd"]
         
 def create_dir(dst_path: Path, src_path: Optional[Path] = None, overwrite: bool = False) -> None:
     if overwrite:
@@ -11,22 +18,102 @@ def create_dir(dst_path: Path, src_path: Optional[Path] = None, overwrite: bool
     else:
         shutil.copytree(src_path, dst_path, dirs_exist_ok=True, symlinks=True)
 
+def _load_zstd() -> Any:
+    try:
+        import zstandard
+    except ImportError as e:
+        from easy_prompting.lm import LMError
+        raise LMError("The \"zstandard\" library has to be manually installed to use zstd compression") from e
+    return zstandard
+
+def compress_text(text: str, compression: Optional[Compression] = None) -> bytes:
+    data = text.encode()
+    match compression:
+        case None:
+            return data
+        case "zlib":
+            return zlib.compress(data)
+        case "zstd":
+            return _load_zstd().ZstdCompressor().compress(data)
+        case _:
+            raise ValueError(f"Unknown compression: {compression!r}")
+
+def decompress_text(data: bytes) -> str:
+    if data[:4] == b"\x28\xb5\x2f\xfd":
+        return _load_zstd().ZstdDecompressor().decompress(data).decode()
+    if len(data) >= 2 and data[0] == 0x78 and (data[0] << 8 | data[1]) % 31 == 0:
+        try:
+            return zlib.decompress(data).decode()
+        except zlib.error:
+            pass
+    return data.decode().replace("\r\n", "\n").replace("\r", "\n")
+
 def load_text(file_path: Path) -> Optional[str]:
-    if file_path.is_file():
-        return file_path.read_text()
-    return None
+    try:
+        return decompress_text(file_path.read_bytes())
+    except (FileNotFoundError, IsADirectoryError):
+        return None
 
-def save_text(file_path: Path, text: Optional[str]) -> None:
+def save_text(file_path: Path, text: Optional[str], compression: Optional[Compression] = None) -> None:
     if text is None:
         if file_path.is_file():
             file_path.unlink()
     else:
         create_dir(file_path.parent)
-        file_path.write_text(text)
+        tmp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            tmp_path.write_bytes(compress_text(text, compression))
+            tmp_path.replace(file_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+@contextmanager
+def lock_file(file_path: Path, lease: float = 600, poll: float = 0.05) -> Iterator[None]:
+    create_dir(file_path.parent)
+    while True:
+        try:
+            os.close(os.open(file_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            break
+        except FileExistsError:
+            try:
+                if time.time() - file_path.stat().st_mtime > lease:
+                    file_path.unlink(missing_ok=True)
+                    continue
+            except FileNotFoundError:
+                continue
+            time.sleep(poll)
+    try:
+        yield
+    finally:
+        file_path.unlink(missing_ok=True)
+
+def truncate_line(file_path: Path, block_size: int = 65536) -> None:
+    if not file_path.is_file():
+        return
+    with file_path.open("rb+") as file:
+        end = file.seek(0, 2)
+        if end == 0:
+            return
+        file.seek(end - 1)
+        if file.read(1) == b"\n":
+            return
+        while end > 0:
+            start = max(0, end - block_size)
+            file.seek(start)
+            newline = file.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                file.truncate(start + newline + 1)
+                return
+            end = start
+        file.truncate(0)
 
 def hash_str(text: str, length: int = 16) -> str:
     return hashlib.blake2b(text.encode(), digest_size=length).hexdigest()
 
+def chain_hash(prefix: str, text: str, length: int = 16) -> str:
+    return hash_str(f"{prefix}:{text}", length)
+
 def pad_text(text: str, padding: str = "  ", pad_first: bool = True) -> str:
     if pad_first:
         return "\n".join(f"{padding}{line}" for line in text.split("\n"))